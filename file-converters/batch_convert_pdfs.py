@@ -16,12 +16,17 @@ from rich.logging import RichHandler
 from datetime import datetime
 import sys
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "search-engine" / "app"))
+from pdf_store import PdfTextStore
+
 
 class BatchPDFConverter:
-    def __init__(self, input_dir: str):
+    def __init__(self, input_dir: str, store_dir: str | None = None, workers: int | None = None):
         """Initialize the batch converter with input directory."""
         self.input_dir = Path(input_dir)
         self.temp_dir = self.input_dir / "temp"
+        self.store_dir = store_dir
+        self.workers = workers
 
         # Create temp directory if it doesn't exist
         self.temp_dir.mkdir(exist_ok=True)
@@ -55,6 +60,8 @@ class BatchPDFConverter:
                 "-o",
                 str(output_path),
             ]
+            if self.store_dir:
+                command += ["--store", self.store_dir]
 
             task_id = progress.add_task(
                 f"[cyan]Converting {pdf_path.name}...", total=100
@@ -86,6 +93,10 @@ class BatchPDFConverter:
             return
 
         self.logger.info(f"Found {len(pdf_files)} PDF files to convert.")
+        if self.store_dir:
+            # One extraction pass; each conversion then only reads the store
+            extracted = PdfTextStore(self.store_dir).extract(pdf_files, self.workers)
+            self.logger.info(f"Extracted {extracted} new PDFs into {self.store_dir}")
 
         with Progress(
             SpinnerColumn(),
@@ -122,13 +133,15 @@ def main():
 
     parser = argparse.ArgumentParser(description="Batch convert PDF files to Markdown")
     parser.add_argument("input_dir", help="Directory containing PDF files")
+    parser.add_argument("--store", help="PDF text store to extract into once and convert from (see pdf_store.py)")
+    parser.add_argument("--workers", type=int, help="PDF extraction processes (default: one per core)")
     args = parser.parse_args()
 
     if not os.path.isdir(args.input_dir):
         print(f"Error: Directory '{args.input_dir}' does not exist.", file=sys.stderr)
         sys.exit(1)
 
-    converter = BatchPDFConverter(args.input_dir)
+    converter = BatchPDFConverter(args.input_dir, args.store, args.workers)
     converter.process_all_pdfs()
 
 
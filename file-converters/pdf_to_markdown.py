@@ -2,17 +2,23 @@
 import argparse
 import logging
 import re
+import sys
 from collections import defaultdict
 from pathlib import Path
 from typing import Dict, List, Tuple
 
-import fitz  # PyMuPDF
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "search-engine" / "app"))
+from pdf_store import PdfTextStore, extract_pdf
 
 
 class PDFToMarkdown:
-    def __init__(self, pdf_path: str):
+    def __init__(self, pdf_path: str, store: PdfTextStore | None = None):
         self.pdf_path = pdf_path
-        self.doc = fitz.open(pdf_path)
+        # Pages parsed once per PDF content version when a store is given
+        self.pdf = store.get(pdf_path) if store is not None else extract_pdf(pdf_path)
+        if self.pdf is None:
+            raise ValueError(f"Could not extract {pdf_path}")
+        self.pages = [page["blocks"] for page in self.pdf["pages"]]
         self.markdown_content = []
         self.header_sizes = {}
         self.previous_block_type = None
@@ -34,24 +40,14 @@ class PDFToMarkdown:
             lambda: {"count": 0, "is_bold": 0, "avg_length": 0, "samples": []}
         )
 
-        for page in self.doc:
-            blocks = page.get_text("dict")["blocks"]
-            for block in blocks:
-                if "lines" not in block:
-                    continue
-
-                for line in block["lines"]:
-                    for span in line["spans"]:
-                        size = round(span["size"], 1)
-                        text = span["text"].strip()
-                        if len(text) > 1:
-                            font_stats[size]["count"] += 1
-                            font_stats[size]["is_bold"] += (
-                                1 if "bold" in span.get("font", "").lower() else 0
-                            )
-                            font_stats[size]["avg_length"] += len(text)
-                            if len(font_stats[size]["samples"]) < 5:
-                                font_stats[size]["samples"].append(text)
+        # Per-page span statistics were gathered when the PDF was extracted
+        for page in self.pdf["pages"]:
+            for font in page["fonts"]:
+                stats = font_stats[font["size"]]
+                stats["count"] += font["spans"]
+                stats["is_bold"] += font["spans"] if font["bold"] else 0
+                stats["avg_length"] += font["characters"]
+                stats["samples"].extend(font["samples"][:5 - len(stats["samples"])])
 
         # Calculate averages
         for stats in font_stats.values():
@@ -179,9 +175,8 @@ class PDFToMarkdown:
         processed_blocks = []
         previous_block_type = None
 
-        for page_num, page in enumerate(self.doc, 1):
-            logging.info(f"Processing page {page_num}/{len(self.doc)}")
-            blocks = page.get_text("dict")["blocks"]
+        for page_num, blocks in enumerate(self.pages, 1):
+            logging.info(f"Processing page {page_num}/{len(self.pages)}")
 
             for i, block in enumerate(blocks):
                 prev_block = blocks[i - 1] if i > 0 else None
@@ -207,10 +202,14 @@ def main():
     )
     parser.add_argument("pdf_path", help="Path to the PDF file")
     parser.add_argument("--output", "-o", help="Output markdown file path (optional)")
+    parser.add_argument(
+        "--store",
+        help="PDF text store to read pages from; PDFs not in it yet are extracted into it (see pdf_store.py)",
+    )
     args = parser.parse_args()
 
     try:
-        converter = PDFToMarkdown(args.pdf_path)
+        converter = PDFToMarkdown(args.pdf_path, PdfTextStore(args.store) if args.store else None)
         markdown_content = converter.convert()
 
         # Determine output path
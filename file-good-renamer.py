@@ -1,7 +1,11 @@
 import os
 import glob
-import subprocess
 import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "search-engine" / "app"))
+from pdf_store import DEFAULT_STORE, PdfTextStore, guess_title
 
 
 def sanitize_filename(name: str) -> str:
@@ -10,9 +14,11 @@ def sanitize_filename(name: str) -> str:
 
 
 class FileAndFolderRenamer:
-    def __init__(self, base_dir):
+    def __init__(self, base_dir, store_dir=DEFAULT_STORE, workers=None):
         """Initialize the handler with directory paths"""
         self.base_dir = base_dir
+        # Stored rows are keyed by content, so they stay valid after the rename
+        store = PdfTextStore(store_dir)
         research_paths = [f"{base_dir}/{dirs}" for dirs in os.listdir(base_dir)]
 
         paths = []
@@ -33,11 +39,18 @@ class FileAndFolderRenamer:
 
         # print(paths)
 
+        # All originals parsed in one pass, then titles read from the store
+        store.extract([path['research_path'] for path in paths], workers)
+
         for path in paths:
             try:
-                # Get title from original PDF
-                command = ['pdftitle', '-p', path['research_path']]
-                output = subprocess.check_output(command, text=True).strip()
+                # Get title from original PDF's stored first page
+                pdf = store.read(store.key(path['research_path']))
+                if pdf is None:
+                    raise ValueError(f"could not extract {path['research_path']}")
+                output = guess_title(pdf)
+                if not output:
+                    raise ValueError(f"no title found in {path['research_path']}")
                 safe_output = sanitize_filename(output)
                 
                 # Create new filenames
@@ -67,9 +80,11 @@ def main():
         description="Change all the files and containing folder name to a more suitable name"
     )
     parser.add_argument("directory", help='Base directory containing PDF files')
+    parser.add_argument("--store", default=DEFAULT_STORE, help='PDF text store to read titles from (see search-engine/app/pdf_store.py)')
+    parser.add_argument("--workers", type=int, help='PDF extraction processes (default: one per core)')
     args = parser.parse_args()
 
-    handler = FileAndFolderRenamer(args.directory)
+    handler = FileAndFolderRenamer(args.directory, args.store, args.workers)
     # handler.process_files_and_folder()
 
 
@@ -1,27 +1,122 @@
 import argparse
+import asyncio
+from contextlib import asynccontextmanager
+from functools import partial
+import json
 import logging
-from fastapi import FastAPI, Path as FastAPIPath, Request
+import time
+from urllib.parse import quote
+from fastapi import Depends, FastAPI, HTTPException, Path as FastAPIPath, Query, Request
 import pathlib as pl
 from pathlib import Path
 
-from fastapi.responses import FileResponse, HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 import pandas as pd
 from uvicorn import run
 
-from engine import SearchEngine
+from cache import QueryCache
+from compression import CompressionMiddleware, PrecompressedStaticFiles, choose_encoding, compress
+from corpora import Corpus, CorpusPrefixMiddleware, CorpusRegistry
+from dataset import read_dataset, read_vocabulary
+from engine import ANALYZER, SearchEngine, TokenizedDocument
+from executor import BudgetExceeded, Overloaded, SearchExecutor
+from metadata import parse_filters
+import metrics
+from metrics import MetricsMiddleware, stage_seconds
+import pagination
+from querylog import QueryLog, most_frequent
+from reloader import IndexGeneration
+from responses import PaperFileResponse
 
 
 script_dir = pl.Path(__file__).resolve().parent
 templates_path = script_dir / "templates"
 static_path = script_dir / "static"
 
-app = FastAPI()
-engine = SearchEngine()
+DEFAULT_PAPERS_DIR = "/home/swayam/Downloads/Clean Cookstove PDFS/Processed Research Papers"
+
+search_executor = SearchExecutor()
+query_cache = QueryCache()
+query_log: QueryLog | None = None
+# Query log whose most frequent queries are run once before serving
+warm_from: str | None = None
+warm_queries = 500
+
+
+def load_engine(
+    data_path: pl.Path,
+    dense_dim: int = 0,
+    hybrid_alpha: float = 0.5,
+    related_k: int = 0,
+    clusters: int = 0,
+) -> SearchEngine:
+    # A .snapshot is a fully built engine, a directory is the crawler's
+    # incremental dataset, anything else a single crawler parquet file
+    if data_path.suffix == '.snapshot':
+        return SearchEngine.load_snapshot(data_path)
+
+    engine = SearchEngine(alpha=hybrid_alpha)
+    data = read_dataset(data_path) if data_path.is_dir() else pd.read_parquet(data_path)
+    vocabulary = read_vocabulary(data_path) if data_path.is_dir() else None
+    if vocabulary is not None and vocabulary.analyzer == ANALYZER and "token_terms" in data.columns:
+        # Rows the crawler tokenized (--tokenize) skip tokenization here
+        tokenized = data["token_terms"].notna().values
+        rows = data[tokenized]
+        engine.bulk_index_tokenized(
+            list(zip(rows["name"].values, rows["content"].values)),
+            vocabulary.terms,
+            [TokenizedDocument(*columns) for columns in zip(
+                rows["term_ids"].values, rows["term_freqs"].values,
+                rows["token_terms"].values, rows["token_offsets"].values,
+            )],
+        )
+        data_to_tokenize = data[~tokenized]
+    else:
+        data_to_tokenize = data
+    if len(data_to_tokenize):
+        engine.bulk_index(list(zip(data_to_tokenize["name"].values, data_to_tokenize["content"].values)))
+    if "canonical" in data.columns:
+        engine.index_duplicates(dict(zip(data["name"].values, data["canonical"].values)))
+    if "journal" in data.columns:
+        metadata_columns = ["title", "authors", "journal", "year", "doi"]
+        records = data.set_index("name")[metadata_columns].to_dict("index")
+        engine.index_metadata(records)
+    if dense_dim:
+        engine.build_dense(dim=dense_dim)
+    if related_k:
+        # Roughly linear in the corpus, but still seconds per 10k papers on
+        # every (re)load: build them into a --save-snapshot where possible
+        engine.build_related(k=related_k)
+    if clusters:
+        engine.build_clusters(n_clusters=clusters)
+    return engine
+
+
+registry = CorpusRegistry()
+registry.register(Corpus('default', load_engine, None, DEFAULT_PAPERS_DIR))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The default corpus is loaded eagerly; others on first request
+    await registry.get()
+    if warm_from:
+        await warm_caches(warm_from, warm_queries)
+    yield
+    registry.shutdown()
+    search_executor.shutdown()
+    if query_log is not None:
+        query_log.close()
+
+
+app = FastAPI(lifespan=lifespan)
 templates = Jinja2Templates(directory=str(templates_path))
 
-app.mount('/static', StaticFiles(directory=str(static_path)), name='static')
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(CorpusPrefixMiddleware)
+app.mount('/static', PrecompressedStaticFiles(directory=str(static_path)), name='static')
 
 def get_top_names(scores_dict: dict, n: int):
     sorted_names = sorted(scores_dict.items(), key=lambda x: x[1], reverse=True)
@@ -30,110 +125,403 @@ def get_top_names(scores_dict: dict, n: int):
 
     return top_n_dict
 
-def get_research_papers(papers_dir: str) -> list[dict]:
-    papers = []
-    try:
-        dir_path = pl.Path(papers_dir)
-        if not dir_path.exists():
-            logging.warning(f"Papers directory not found: {papers_dir}")
-            return papers
-            
-        for folder in dir_path.iterdir():
-            if folder.is_dir():
-                try:
-                    paper = {
-                        'name': folder.name,
-                        'pdf': next(folder.glob('*.pdf')),
-                        'summary_md': next(folder.glob('summary_*.md')),
-                        'summary_pdf': next(folder.glob('summary_*.pdf'))
-                    }
-                    papers.append(paper)
-                except StopIteration:
-                    logging.warning(f"Missing files in folder: {folder}")
-                except Exception as e:
-                    logging.error(f"Error processing folder {folder}: {e}")
-    except Exception as e:
-        logging.error(f"Error accessing papers directory: {e}")
-    
-    return papers
+async def get_corpus(request: Request, corpus: str | None = None) -> Corpus:
+    # Selected by a /c/<name>/ path prefix or a ?corpus= parameter
+    name = corpus or request.scope.get('corpus')
+    if name is not None and name not in registry:
+        raise HTTPException(status_code=404, detail="Unknown corpus")
+    return await registry.get(name)
 
+def link_prefix(corpus: Corpus) -> str:
+    return '' if corpus.name == registry.default else corpus.prefix
 
 @app.get('/', response_class=HTMLResponse)
-async def search(request: Request):
-    papers = engine.papers
+async def search(request: Request, corpus: Corpus = Depends(get_corpus)):
+    papers = corpus.indexes.current.engine.papers
     return templates.TemplateResponse(
-        'search.html', {'request': request, 'papers': papers}
+        'search.html', {'request': request, 'papers': papers, 'prefix': link_prefix(corpus)}
     )
 
-@app.get('/results/{query}', response_class=HTMLResponse)
-async def search_results(request: Request, query: str = FastAPIPath(...)):
-    papers_dir = "/home/swayam/Downloads/Clean Cookstove PDFS/Processed Research Papers"
-    results = engine.search(query)
-    top_results = get_top_names(results, n=10)
-    
-    # Get all papers once and create mapping
-    papers = {p['name']: p for p in get_research_papers(papers_dir)}
-    
-    # Enrich results using paper mapping
+def enrich_results(
+    corpus: Corpus, engine: SearchEngine, scores: dict[str, float], query: str | None = None
+) -> list[dict]:
+    # One catalog lookup per hit; the papers directory is never scanned here
     enriched_results = []
-    for name, score in top_results.items():
-        if name in papers:
-            paper = papers[name]
+    for name, score in scores.items():
+        paper = corpus.catalog.get(name)
+        if paper is not None:
             enriched_results.append({
                 'name': name,
                 'score': score,
+                'snippet': engine.snippet(name, query) if query else [],
+                'topic': engine.cluster_of(name),
+                'metadata': engine.metadata(name),
+                'duplicates': engine.duplicates_of(name),
                 'pdf': paper['pdf'],
                 'summary_md': paper['summary_md'],
                 'summary_pdf': paper['summary_pdf']
             })
-    
-    return templates.TemplateResponse(
+
+    return enriched_results
+
+def group_by_topic(results: list[dict]) -> list[tuple[int | None, list[dict]]]:
+    # Keep rank order: topics appear in the order of their best hit
+    groups: dict[int | None, list[dict]] = {}
+    for result in results:
+        groups.setdefault(result['topic'], []).append(result)
+    return list(groups.items())
+
+def cached_search(corpus: Corpus, index: IndexGeneration, text: str, filters: list) -> dict[str, float]:
+    return query_cache.get_or_compute(
+        (corpus.name, index.generation, text, tuple(filters)),
+        # One hit per near-duplicate group, so every view and page count agrees
+        lambda: index.engine.collapse_duplicates(index.engine.hybrid_search(text, filters))
+    )
+
+def score_search(corpus: Corpus, index: IndexGeneration, text: str, filters: list) -> dict[str, float]:
+    # Timed here on the executor, so the score stage leaves out queue wait
+    start = time.perf_counter()
+    results = cached_search(corpus, index, text, filters)
+    stage_seconds.observe('score', time.perf_counter() - start)
+    return results
+
+def run_search(corpus: Corpus, index: IndexGeneration, text: str, filters: list, topic: int | None):
+    # CPU-bound part of a results page; runs on the search executor
+    engine = index.engine
+    results = score_search(corpus, index, text, filters)
+    scored = time.perf_counter()
+
+    topics = engine.cluster_counts(results)
+    facets = engine.facets(results)
+    if topic is not None:
+        results = {name: score for name, score in results.items() if engine.cluster_of(name) == topic}
+    faceted = time.perf_counter()
+    stage_seconds.observe('facets', faceted - scored)
+
+    top_results = get_top_names(results, n=10)
+    stage_seconds.observe('topk', time.perf_counter() - faceted)
+    return top_results, topics, facets
+
+async def warm_caches(log_path: str, limit: int) -> None:
+    start = time.perf_counter()
+    queries = await asyncio.to_thread(most_frequent, log_path, limit)
+    warmed = 0
+    for name, query in queries:
+        if name not in registry:
+            continue
+        corpus = await registry.get(name)
+        text, filters = parse_filters(query)
+        await asyncio.to_thread(cached_search, corpus, corpus.indexes.current, text, filters)
+        warmed += 1
+    logging.info(f"Pre-warmed {warmed} queries from {log_path} in {time.perf_counter() - start:.1f}s")
+
+async def execute_search(*args):
+    try:
+        return await search_executor.run(*args)
+    except Overloaded:
+        metrics.rejected_total.inc('overloaded')
+        raise HTTPException(
+            status_code=503, detail="Server busy, try again shortly", headers={"Retry-After": "1"}
+        )
+    except BudgetExceeded:
+        metrics.rejected_total.inc('budget_exceeded')
+        raise HTTPException(status_code=503, detail="Search took too long")
+
+# :path, so filter values such as doi:10.1000/xyz may contain slashes
+@app.get('/results/{query:path}', response_class=HTMLResponse)
+async def search_results(
+    request: Request,
+    query: str = FastAPIPath(...),
+    topic: int | None = None,
+    corpus: Corpus = Depends(get_corpus),
+):
+    index = corpus.indexes.current
+    start = received = time.perf_counter()
+    text, filters = parse_filters(query)
+    stage_seconds.observe('parse', time.perf_counter() - start)
+    top_results, topics, facets = await execute_search(run_search, corpus, index, text, filters, topic)
+
+    start = time.perf_counter()
+    enriched_results = enrich_results(corpus, index.engine, top_results, text)
+    rendered = time.perf_counter()
+    stage_seconds.observe('enrich', rendered - start)
+
+    response = templates.TemplateResponse(
         "results.html", {
             "request": request,
+            "prefix": link_prefix(corpus),
+            "has_related": index.engine.has_related,
             "query": query,
+            "facets": facets,
             "results": enriched_results,
+            "groups": group_by_topic(enriched_results),
+            "topics": topics,
+            "topic_labels": {cluster: label for cluster, label, _ in topics},
+            "active_topic": topic,
             "total_results": len(enriched_results)
         })
+    finished = time.perf_counter()
+    stage_seconds.observe('render', finished - rendered)
+    if query_log is not None:
+        query_log.record(corpus.name, 'results', query, finished - received)
+    return response
+
+def paper_json(corpus: Corpus, engine: SearchEngine, name: str, score: float) -> dict:
+    paper = corpus.catalog.get(name)
+    files = {}
+    if paper is not None:
+        for key in ('pdf', 'summary_md', 'summary_pdf'):
+            files[key] = f"{link_prefix(corpus)}/papers/{quote(name)}/{quote(paper[key].name)}"
+    return {
+        'name': name,
+        'score': score,
+        'topic': engine.cluster_of(name),
+        'metadata': engine.metadata(name),
+        'duplicates': engine.duplicates_of(name),
+        **files
+    }
+
+@app.get('/api/search')
+async def api_search(
+    q: str = Query(..., description="Query text, optionally with metadata filters"),
+    limit: int = Query(10, ge=1, le=1000),
+    cursor: str | None = None,
+    format: str = Query('json', pattern='^(json|ndjson)$'),
+    corpus: Corpus = Depends(get_corpus),
+):
+    if cursor is not None:
+        try:
+            pagination.decode_cursor(cursor)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    index = corpus.indexes.current
+    start = received = time.perf_counter()
+    text, filters = parse_filters(q)
+    stage_seconds.observe('parse', time.perf_counter() - start)
+    results = await execute_search(score_search, corpus, index, text, filters)
+
+    if format == 'ndjson':
+        # Bulk export: every remaining hit, one JSON object per line
+        lines = (
+            json.dumps(paper_json(corpus, index.engine, name, score)) + "\n"
+            for name, score in pagination.stream(results, cursor)
+        )
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    start = time.perf_counter()
+    items, next_cursor = pagination.page(results, limit, cursor)
+    paged = time.perf_counter()
+    stage_seconds.observe('topk', paged - start)
+    papers = [paper_json(corpus, index.engine, name, score) for name, score in items]
+    finished = time.perf_counter()
+    stage_seconds.observe('enrich', finished - paged)
+    if query_log is not None and cursor is None:
+        query_log.record(corpus.name, 'api', q, finished - received)
+    return {
+        'query': q,
+        'total': len(results),
+        'results': papers,
+        'next_cursor': next_cursor
+    }
+
+@app.get('/related/{name}', response_class=HTMLResponse)
+async def related_papers(
+    request: Request, name: str = FastAPIPath(...), corpus: Corpus = Depends(get_corpus)
+):
+    engine = corpus.indexes.current.engine
+    if not engine.has_related:
+        raise HTTPException(status_code=404, detail="Related papers are not enabled")
+    neighbours = engine.related(name)
+    if neighbours is None:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    copies = set(engine.duplicates_of(name))
+    neighbours = engine.collapse_duplicates({n: s for n, s in neighbours.items() if n not in copies})
 
-@app.get('/papers')
-async def list_papers(request: Request):
-    papers_dir = "/home/swayam/Downloads/Clean Cookstove PDFS/Processed Research Papers"
-    papers = get_research_papers(papers_dir)
     return templates.TemplateResponse(
-        "papers.html",
-        {"request": request, "papers": papers}
-    )
+        "related.html", {
+            "request": request,
+            "prefix": link_prefix(corpus),
+            "has_related": True,
+            "name": name,
+            "results": enrich_results(corpus, engine, neighbours)
+        })
+
+@app.get('/papers')
+async def list_papers(request: Request, corpus: Corpus = Depends(get_corpus)):
+    # Rendered page, valid for one catalog version and base URL, with its
+    # compressed variants added as clients ask for them
+    page_cache = corpus.papers_page_cache
+    has_related = corpus.indexes.current.engine.has_related
+    key = (corpus.catalog.version, str(request.base_url), has_related)
+    if page_cache.get('key') != key:
+        metrics.papers_page_total.inc('miss')
+        start = time.perf_counter()
+        papers = corpus.catalog.papers
+        body = templates.get_template("papers.html").render(
+            request=request, papers=papers, prefix=link_prefix(corpus), has_related=has_related
+        ).encode()
+        stage_seconds.observe('render', time.perf_counter() - start)
+        page_cache.clear()
+        page_cache.update(key=key, bodies={None: body})
+    else:
+        metrics.papers_page_total.inc('hit')
+
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    bodies = page_cache['bodies']
+    if encoding not in bodies:
+        bodies[encoding] = compress(bodies[None], encoding)
+
+    headers = {"vary": "Accept-Encoding"}
+    if encoding is not None:
+        headers["content-encoding"] = encoding
+    return Response(bodies[encoding], media_type="text/html; charset=utf-8", headers=headers)
 
 
 # file serving route
-@app.get('/papers/{folder}/{filename}')
+@app.api_route('/papers/{folder}/{filename}', methods=['GET', 'HEAD'])
 async def serve_paper(
     folder: str = FastAPIPath(...),
-    filename: str = FastAPIPath(...)
+    filename: str = FastAPIPath(...),
+    corpus: Corpus = Depends(get_corpus)
 ):
-    papers_dir = "/home/swayam/Downloads/Clean Cookstove PDFS/Processed Research Papers"
-    file_path = pl.Path(papers_dir) / folder / filename
-    if not file_path.exists():
-        return {"error": "File not found"}, 404
-    return FileResponse(str(file_path))
+    info = corpus.catalog.file_info(folder, filename)
+    if info is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return PaperFileResponse(info)
+
+
+@app.get('/admin/index')
+async def index_status():
+    return {
+        corpus.name: {
+            'loaded': corpus.loaded,
+            'default': corpus.name == registry.default,
+            **corpus.indexes.status()
+        }
+        for corpus in registry.corpora
+    }
+
+
+@app.get('/admin/index/stats')
+async def index_stats(
+    top: int = Query(20, ge=0, le=1000), corpus: Corpus = Depends(get_corpus)
+):
+    # Walks the whole index, so keep it off the event loop
+    index = corpus.indexes.current
+    stats = await asyncio.to_thread(index.engine.stats, top)
+    return {'corpus': corpus.name, 'generation': index.generation,
+            'load_seconds': round(index.load_seconds, 3), **stats}
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+async def prometheus_metrics():
+    corpora = registry.corpora
+    lines = [
+        *stage_seconds.render(),
+        *metrics.requests_total.render(),
+        *metrics.request_seconds_total.render(),
+        *metrics.rejected_total.render(),
+        *metrics.papers_page_total.render(),
+        *metrics.collected('query_cache_lookups_total', 'Query cache lookups by result.', [
+            ((('result', 'hit'),), query_cache.hits),
+            ((('result', 'miss'),), query_cache.misses),
+        ], kind='counter'),
+        *metrics.collected('search_in_flight', 'Searches admitted to the executor.', [
+            ((), search_executor.in_flight),
+        ]),
+        *metrics.collected('search_queue_depth', 'Admitted searches waiting for a worker.', [
+            ((), search_executor.queue_depth),
+        ]),
+        *metrics.collected('corpus_loaded', 'Whether a corpus is loaded.', [
+            ((('corpus', c.name),), c.loaded) for c in corpora
+        ]),
+        *metrics.collected('index_documents', 'Documents in the active index generation.', [
+            ((('corpus', c.name),), c.indexes.current.engine.number_of_documents) for c in corpora
+        ]),
+        *metrics.collected('index_generation', 'Active index generation number.', [
+            ((('corpus', c.name),), c.indexes.current.generation) for c in corpora
+        ]),
+        *metrics.collected('index_approximate_bytes', 'Approximate memory held by the index.', [
+            ((('corpus', c.name),), c.indexes.current.nbytes) for c in corpora
+        ]),
+        *metrics.collected('catalog_papers', 'Papers in the catalog.', [
+            ((('corpus', c.name),), len(c.catalog)) for c in corpora
+        ]),
+    ]
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
 
 
 @app.get("/about")
 def read_about(request: Request):
-    return templates.TemplateResponse("about.html", {"request": request})
+    return templates.TemplateResponse("about.html", {"request": request, "prefix": ""})
 
 
 def parse_args():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--data-path")
+    parser.add_argument("--data-path", help="Crawler dataset directory, index.parquet, or a .snapshot of a built engine")
+    parser.add_argument("--index-poll", type=float, default=10.0,
+                        help="Seconds between checks for a new index file to hot-reload")
+    parser.add_argument("--save-snapshot",
+                        help="After building, write the engine snapshot to this path")
+    parser.add_argument("--papers-dir", default=DEFAULT_PAPERS_DIR,
+                        help="Folder of per-paper directories (PDF + summaries)")
+    parser.add_argument("--corpora",
+                        help="JSON file of extra corpora: {name: {data_path, papers_dir}}, "
+                             "served under /c/<name>/ or with ?corpus=<name>")
+    parser.add_argument("--memory-budget-mb", type=int, default=4096,
+                        help="Approximate index memory kept loaded before evicting idle corpora")
+    parser.add_argument("--catalog-poll", type=float, default=5.0,
+                        help="Seconds between checks for added or changed papers")
+    parser.add_argument("--search-workers", type=int, default=4,
+                        help="Threads executing searches off the event loop")
+    parser.add_argument("--search-queue", type=int, default=32,
+                        help="Searches allowed to wait for a worker before rejecting with 503")
+    parser.add_argument("--search-timeout", type=float, default=2.0,
+                        help="Per-query time budget in seconds")
+    parser.add_argument("--dense-dim", type=int, default=0,
+                        help="LSA dimensions for hybrid retrieval (0 disables it)")
+    parser.add_argument("--related-k", type=int, default=0,
+                        help="Related papers precomputed per paper (0 disables them); built on every load, "
+                             "so prefer building them once into a --save-snapshot")
+    parser.add_argument("--clusters", type=int, default=0,
+                        help="Topic clusters to group results by (0 disables them)")
+    parser.add_argument("--query-log",
+                        help="Append each query with its latency to this size-rotated log")
+    parser.add_argument("--query-log-mb", type=int, default=16,
+                        help="Rotate the query log after this many megabytes")
+    parser.add_argument("--warm-from",
+                        help="Query log whose most frequent queries pre-warm the caches at startup")
+    parser.add_argument("--warm-queries", type=int, default=500,
+                        help="Distinct queries to pre-warm")
+    parser.add_argument("--hybrid-alpha", type=float, default=0.5,
+                        help="Weight of BM25 against dense similarity")
     return parser.parse_args()
 
 if __name__ == "__main__":
     args = parse_args()
-    
-    data = pd.read_parquet(args.data_path)
-    content = list(zip(data["name"].values, data["content"].values))
+    search_executor = SearchExecutor(args.search_workers, args.search_queue, args.search_timeout)
+    if args.query_log:
+        query_log = QueryLog(args.query_log, max_bytes=args.query_log_mb << 20)
+    warm_from, warm_queries = args.warm_from, args.warm_queries
+
+    loader = partial(
+        load_engine,
+        dense_dim=args.dense_dim,
+        hybrid_alpha=args.hybrid_alpha,
+        related_k=args.related_k,
+        clusters=args.clusters,
+    )
+    make_corpus = partial(Corpus, loader=loader, index_poll=args.index_poll, catalog_poll=args.catalog_poll)
+
+    registry = CorpusRegistry(memory_budget=args.memory_budget_mb << 20)
+    registry.register(make_corpus('default', data_path=args.data_path, papers_dir=args.papers_dir))
+    if args.corpora:
+        registry.register_file(args.corpora, make_corpus)
 
-    engine.bulk_index(content)
+    default_corpus = registry.corpora[0]
+    default_corpus.load()
+    if args.save_snapshot:
+        default_corpus.indexes.current.engine.save_snapshot(args.save_snapshot)
 
     run(app, host="127.0.0.1", port=8000)
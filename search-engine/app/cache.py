@@ -0,0 +1,33 @@
+import threading
+
+from cachetools import LRUCache
+
+
+class QueryCache:
+    """Thread-safe LRU of full result sets, keyed by parsed query.
+
+    Paging through a result set, or re-rendering it, reuses the cached
+    scores instead of searching again.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self._cache: LRUCache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._cache[key] = value
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import os
+import pathlib as pl
+from typing import NamedTuple
+
+
+class FileInfo(NamedTuple):
+    path: pl.Path
+    size: int
+    mtime_ns: int
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.size:x}-{self.mtime_ns:x}"'
+
+
+def scan_folder(folder: pl.Path) -> dict | None:
+    try:
+        files = {}
+        for entry in os.scandir(folder):
+            if entry.is_file():
+                stat = entry.stat()
+                files[entry.name] = FileInfo(pl.Path(entry.path), stat.st_size, stat.st_mtime_ns)
+        names = sorted(files)
+        return {
+            'name': folder.name,
+            'pdf': next(files[n].path for n in names if n.endswith('.pdf') and not n.startswith('summary_')),
+            'summary_md': next(files[n].path for n in names if n.startswith('summary_') and n.endswith('.md')),
+            'summary_pdf': next(files[n].path for n in names if n.startswith('summary_') and n.endswith('.pdf')),
+            'files': files
+        }
+    except StopIteration:
+        logging.warning(f"Missing files in folder: {folder}")
+    except Exception as e:
+        logging.error(f"Error processing folder {folder}: {e}")
+    return None
+
+
+class PaperCatalog:
+    """In-memory map of paper name -> PDF and summary paths.
+
+    Built once and then kept current by polling folder mtimes: only folders
+    whose mtime changed are scanned again, which covers files added,
+    removed or renamed. File sizes and mtimes are kept too for response
+    headers; PaperFileResponse stats the file before using them, since a
+    file rewritten in place leaves its folder's mtime alone. Readers
+    always see a complete mapping because refresh swaps in a new dict.
+    """
+
+    def __init__(self, papers_dir: str | os.PathLike):
+        self.papers_dir = pl.Path(papers_dir)
+        self.version = 0
+        self._papers: dict[str, dict] = {}
+        self._mtimes: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._papers)
+
+    def get(self, name: str) -> dict | None:
+        return self._papers.get(name)
+
+    def file_info(self, name: str, filename: str) -> FileInfo | None:
+        """Cached size/mtime of a file inside a paper folder, without touching disk."""
+        paper = self._papers.get(name)
+        return paper['files'].get(filename) if paper is not None else None
+
+    @property
+    def papers(self) -> list[dict]:
+        return list(self._papers.values())
+
+    def refresh(self) -> bool:
+        """Rescan changed folders; returns True if the catalog changed."""
+        try:
+            entries = {
+                entry.name: entry.stat().st_mtime_ns
+                for entry in os.scandir(self.papers_dir)
+                if entry.is_dir()
+            }
+        except FileNotFoundError:
+            logging.warning(f"Papers directory not found: {self.papers_dir}")
+            entries = {}
+        except Exception as e:
+            logging.error(f"Error accessing papers directory: {e}")
+            return False
+
+        if entries == self._mtimes:
+            return False
+
+        papers = {}
+        for name, mtime in sorted(entries.items()):
+            if self._mtimes.get(name) == mtime and name in self._papers:
+                papers[name] = self._papers[name]
+                continue
+            paper = scan_folder(self.papers_dir / name)
+            if paper is not None:
+                papers[name] = paper
+
+        changed = papers != self._papers
+        self._papers = papers
+        self._mtimes = entries
+        if changed:
+            self.version += 1
+        return changed
+
+    async def watch(self, interval: float = 5.0) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            if await asyncio.to_thread(self.refresh):
+                logging.info(f"Paper catalog updated: {len(self)} papers (version {self.version})")
@@ -0,0 +1,216 @@
+import argparse
+import gzip
+import os
+import pathlib as pl
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse
+from starlette.staticfiles import StaticFiles
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/x-ndjson", "application/javascript",
+    "application/xml", "image/svg+xml",
+)
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """Pick br or gzip from an Accept-Encoding header, preferring br."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if accepted.get(coding, accepted.get("*", 0)) > 0:
+            return coding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=4)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """gzip/brotli response compression negotiated from Accept-Encoding.
+
+    Responses that already carry a Content-Encoding (cached or
+    precompressed bodies), partial/empty responses, non-text content
+    types such as PDFs and bodies sent through the pathsend/zerocopy
+    extensions pass through untouched. Streaming bodies are compressed and
+    flushed chunk by chunk. A compressed body is not byte-range
+    addressable and differs from the identity one, so Accept-Ranges is
+    dropped and a strong ETag made weak.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSender(send, encoding, self.minimum_size))
+
+
+class _CompressingSender:
+    def __init__(self, send: Send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Message | None = None
+        self.passthrough = False
+        self.compressor: _Compressor | None = None
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] in (204, 206, 304)
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                self.start = message
+            return
+
+        if self.passthrough or message["type"] != "http.response.body":
+            if self.start is not None:
+                # A file sent by path or descriptor: the body never passes through here
+                start, self.start = self.start, None
+                self.passthrough = True
+                await self.send(start)
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start["headers"])
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            headers["content-encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if "accept-ranges" in headers:
+                del headers["accept-ranges"]
+            etag = headers.get("etag")
+            if etag is not None and not etag.startswith("W/"):
+                headers["etag"] = f"W/{etag}"
+            if more_body:
+                del headers["content-length"]
+                self.compressor = _Compressor(self.encoding)
+            else:
+                body = compress(body, self.encoding)
+                headers["content-length"] = str(len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            await self.send(start)
+
+        data = self.compressor.chunk(body)
+        if not more_body:
+            data += self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves build-time .br/.gz siblings when accepted."""
+
+    async def get_response(self, path: str, scope: Scope):
+        response = await super().get_response(path, scope)
+        if not isinstance(response, FileResponse) or response.status_code != 200:
+            return response
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return response
+        compressed_path = f"{response.path}{PRECOMPRESSED_SUFFIXES[encoding]}"
+        try:
+            stat_result = os.stat(compressed_path)
+        except OSError:
+            return response
+        if stat_result.st_mtime < response.stat_result.st_mtime:
+            return response  # stale build output
+
+        return FileResponse(
+            compressed_path,
+            stat_result=stat_result,
+            media_type=response.media_type,
+            headers={"content-encoding": encoding, "vary": "Accept-Encoding"},
+        )
+
+
+def precompress_static(static_dir: str | os.PathLike) -> int:
+    """Write .br and .gz copies of compressible static assets; returns files written."""
+    written = 0
+    for path in pl.Path(static_dir).rglob("*"):
+        if not path.is_file() or path.suffix in (".br", ".gz"):
+            continue
+        if path.suffix not in (".css", ".js", ".html", ".svg", ".json", ".txt"):
+            continue
+        body = path.read_bytes()
+        encodings = ["gzip"] + (["br"] if brotli is not None else [])
+        for encoding in encodings:
+            target = path.with_name(path.name + PRECOMPRESSED_SUFFIXES[encoding])
+            if encoding == "br":
+                target.write_bytes(brotli.compress(body, quality=11))
+            else:
+                target.write_bytes(gzip.compress(body, compresslevel=9, mtime=0))
+            written += 1
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompress static assets for the search app")
+    parser.add_argument(
+        "static_dir", nargs="?", default=str(pl.Path(__file__).resolve().parent / "static")
+    )
+    args = parser.parse_args()
+    print(f"Wrote {precompress_static(args.static_dir)} precompressed files")
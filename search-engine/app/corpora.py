@@ -0,0 +1,128 @@
+import asyncio
+import json
+import logging
+import pathlib as pl
+from collections import OrderedDict
+from typing import Callable
+from urllib.parse import quote
+
+from catalog import PaperCatalog
+from engine import SearchEngine
+from reloader import IndexReloader
+
+
+class Corpus:
+    """One named collection: its index generations, paper catalog and page cache."""
+
+    def __init__(self, name: str, loader: Callable[[pl.Path], SearchEngine], data_path: str,
+                 papers_dir: str, index_poll: float = 10.0, catalog_poll: float = 5.0):
+        self.name = name
+        self.indexes = IndexReloader(loader, path=data_path, interval=index_poll)
+        self.catalog = PaperCatalog(papers_dir)
+        self.catalog_poll = catalog_poll
+        self.papers_page_cache: dict = {}
+        self.loaded = False
+        self._watchers: list[asyncio.Task] = []
+        self._load_lock = asyncio.Lock()
+
+    @property
+    def prefix(self) -> str:
+        return f"/c/{self.name}"
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.indexes.current.nbytes
+
+    def load(self) -> None:
+        if self.indexes.path is not None:
+            self.indexes.load()
+        self.catalog.refresh()
+        self.loaded = True
+
+    def start_watching(self) -> None:
+        self._watchers = [asyncio.create_task(self.catalog.watch(self.catalog_poll))]
+        if self.indexes.path is not None:
+            self._watchers.append(asyncio.create_task(self.indexes.watch()))
+
+    def unload(self) -> None:
+        for watcher in self._watchers:
+            watcher.cancel()
+        self._watchers = []
+        self.indexes = IndexReloader(self.indexes.loader, path=self.indexes.path, interval=self.indexes.interval)
+        self.catalog = PaperCatalog(self.catalog.papers_dir)
+        self.papers_page_cache = {}
+        self.loaded = False
+
+
+class CorpusRegistry:
+    """Named corpora loaded on first use and evicted least-recently-used
+    once their combined index size exceeds the memory budget.
+    """
+
+    def __init__(self, memory_budget: int = 4 << 30):
+        self.memory_budget = memory_budget
+        self.default: str | None = None
+        self._corpora: dict[str, Corpus] = {}
+        self._loaded: OrderedDict[str, Corpus] = OrderedDict()
+
+    def register(self, corpus: Corpus, default: bool = False) -> None:
+        self._corpora[corpus.name] = corpus
+        if default or self.default is None:
+            self.default = corpus.name
+
+    def register_file(self, config_path: str, make_corpus: Callable[..., Corpus]) -> None:
+        """Register corpora from a JSON object of name -> {data_path, papers_dir}."""
+        with open(config_path, encoding="utf-8") as f:
+            config = json.load(f)
+        for name, options in config.items():
+            self.register(make_corpus(name, options["data_path"], options["papers_dir"]))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._corpora
+
+    @property
+    def corpora(self) -> list[Corpus]:
+        return list(self._corpora.values())
+
+    async def get(self, name: str | None = None) -> Corpus:
+        corpus = self._corpora[name or self.default]
+        if not corpus.loaded:
+            async with corpus._load_lock:
+                if not corpus.loaded:
+                    await asyncio.to_thread(corpus.load)
+                    logging.info(f"Loaded corpus {corpus.name} (~{corpus.memory_bytes >> 20} MiB)")
+        if not corpus._watchers:
+            # Also covers a corpus loaded before the event loop started
+            corpus.start_watching()
+        self._loaded[corpus.name] = corpus
+        self._loaded.move_to_end(corpus.name)
+        self._evict(keep=corpus.name)
+        return corpus
+
+    def _evict(self, keep: str) -> None:
+        while sum(c.memory_bytes for c in self._loaded.values()) > self.memory_budget:
+            victim = next((name for name in self._loaded if name != keep), None)
+            if victim is None:
+                break
+            corpus = self._loaded.pop(victim)
+            corpus.unload()
+            logging.info(f"Evicted corpus {victim} to stay within the memory budget")
+
+    def shutdown(self) -> None:
+        for corpus in self._loaded.values():
+            corpus.unload()
+        self._loaded.clear()
+
+
+class CorpusPrefixMiddleware:
+    """Route /c/<name>/<path> to <path>, recording the corpus name in the scope."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith("/c/"):
+            name, _, rest = scope["path"][3:].partition("/")
+            path = "/" + rest
+            scope = dict(scope, path=path, raw_path=quote(path).encode(), corpus=name)
+        await self.app(scope, receive, send)
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import pathlib as pl
+from typing import NamedTuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+MANIFEST_NAME = "manifest.json"
+VOCABULARY_NAME = "vocabulary.json"
+DUPLICATES_NAME = "duplicates.json"
+
+
+class SourceFile(NamedTuple):
+    name: str
+    size: int
+    mtime_ns: int
+    sha256: str
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class Vocabulary(NamedTuple):
+    """Terms whose list index is the term id in the token columns, and the analyzer that produced them."""
+    analyzer: str
+    terms: list[str]
+
+
+def read_vocabulary(directory: str | os.PathLike) -> Vocabulary | None:
+    path = pl.Path(directory) / VOCABULARY_NAME
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return Vocabulary(**json.load(f))
+
+
+def write_vocabulary(directory: str | os.PathLike, vocabulary: Vocabulary) -> None:
+    """Replace the vocabulary atomically.
+
+    Term ids only ever get appended, so a vocabulary written for a part that
+    is never committed is still valid for every committed part.
+    """
+    directory = pl.Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp_path = directory / f"{VOCABULARY_NAME}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(vocabulary._asdict(), f, ensure_ascii=False)
+    os.replace(tmp_path, directory / VOCABULARY_NAME)
+
+
+def read_duplicates(directory: str | os.PathLike) -> dict[str, str] | None:
+    """Near-duplicate papers mapped to the canonical paper of their group, if the crawler grouped them."""
+    path = pl.Path(directory) / DUPLICATES_NAME
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_duplicates(directory: str | os.PathLike, canonical: dict[str, str]) -> None:
+    tmp_path = pl.Path(directory) / f"{DUPLICATES_NAME}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(canonical.items())), f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, pl.Path(directory) / DUPLICATES_NAME)
+
+
+class Manifest:
+    """What the crawler has already indexed into a dataset directory.
+
+    ``files`` maps each source path to the paper name, size, mtime and
+    content hash it was indexed with; ``parts`` lists the parquet files in
+    the order they were appended. Later parts override earlier ones.
+    """
+
+    def __init__(self, directory: str | os.PathLike):
+        self.directory = pl.Path(directory)
+        self.files: dict[str, SourceFile] = {}
+        self.parts: list[str] = []
+        path = self.directory / MANIFEST_NAME
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.files = {source: SourceFile(**info) for source, info in data["files"].items()}
+            self.parts = data["parts"]
+
+    def save(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.directory / f"{MANIFEST_NAME}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "files": {source: info._asdict() for source, info in sorted(self.files.items())},
+                "parts": self.parts,
+            }, f, indent=1)
+        os.replace(tmp_path, self.directory / MANIFEST_NAME)
+
+    def next_part_name(self) -> str:
+        numbers = [int(part[5:10]) for part in self.parts]
+        return f"part-{max(numbers, default=0) + 1:05d}.parquet"
+
+
+class PartWriter:
+    """Stream rows (name, content, deleted, ...) into a new dataset part.
+
+    Rows are buffered and written as one parquet row group per
+    ``row_group_size`` rows, so memory does not grow with the number of
+    papers. The part is complete on disk before the manifest that lists
+    it is replaced, so readers never see a partial part.
+    """
+
+    def __init__(self, manifest: Manifest, schema: pa.Schema, row_group_size: int = 1024):
+        self.manifest = manifest
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.name = manifest.next_part_name()
+        self.rows_written = 0
+        self._tmp_path = manifest.directory / f"{self.name}.tmp"
+        self._writer: pq.ParquetWriter | None = None
+        self._rows: list[dict] = []
+
+    def write(self, row: dict) -> None:
+        self._rows.append(row)
+        if len(self._rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        if self._writer is None:
+            self.manifest.directory.mkdir(parents=True, exist_ok=True)
+            self._writer = pq.ParquetWriter(self._tmp_path, self.schema)
+        self._writer.write_table(pa.Table.from_pylist(self._rows, schema=self.schema))
+        self.rows_written += len(self._rows)
+        self._rows = []
+
+    def commit(self, replace: bool = False) -> str | None:
+        """Finish the part and record it; returns its name, or None if no rows were written.
+
+        With ``replace`` the manifest lists only the new part afterwards.
+        """
+        self.flush()
+        if self._writer is None:
+            return None
+        self._writer.close()
+        os.replace(self._tmp_path, self.manifest.directory / self.name)
+        if replace:
+            self.manifest.parts = [self.name]
+        else:
+            self.manifest.parts.append(self.name)
+        self.manifest.save()
+        return self.name
+
+    def abort(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._tmp_path.unlink(missing_ok=True)
+
+
+def read_dataset(directory: str | os.PathLike, columns: list[str] | None = None) -> pd.DataFrame:
+    """Live rows of a dataset directory: the latest version of each paper, minus deletions.
+
+    ``columns`` limits the columns read (a part lacking one reads it as
+    None). With grouped duplicates a ``canonical`` column names each
+    paper's canonical paper, itself for most.
+    """
+    manifest = Manifest(directory)
+    if not manifest.parts:
+        return pd.DataFrame(columns=columns or ["name", "content"])
+    frames = []
+    for part in manifest.parts:
+        path = manifest.directory / part
+        if columns is None:
+            frames.append(pd.read_parquet(path))
+        else:
+            available = set(pq.read_schema(path).names)
+            wanted = ["name", *columns, "deleted"]
+            frames.append(pd.read_parquet(path, columns=[c for c in dict.fromkeys(wanted) if c in available]))
+    data = pd.concat(frames, ignore_index=True)
+    data = data.drop_duplicates("name", keep="last")
+    # Parts written with and without --metadata leave gaps; None reads as missing
+    data = data.astype(object).where(data.notna(), None)
+    if "deleted" in data.columns:
+        data = data[~data["deleted"].astype(bool)].drop(columns="deleted")
+    data = data.reset_index(drop=True)
+    duplicates = read_duplicates(directory)
+    if duplicates is not None and (columns is None or "canonical" in columns):
+        data["canonical"] = [duplicates.get(name, name) for name in data["name"]]
+    return data
+
+
+def compact(directory: str | os.PathLike, schema: pa.Schema | None = None,
+            row_group_size: int = 1024) -> str | None:
+    """Rewrite all parts as a single part holding only live rows.
+
+    The part goes through PartWriter like an appended one, with ``schema``
+    (by default the newest part's) plus any column only older parts have.
+    """
+    manifest = Manifest(directory)
+    if len(manifest.parts) < 2:
+        return None
+    part_schemas = [pq.read_schema(manifest.directory / part) for part in reversed(manifest.parts)]
+    schema = (schema or part_schemas[0]).remove_metadata()
+    for field in (field for part_schema in part_schemas for field in part_schema):
+        if field.name not in schema.names:
+            schema = schema.append(field)
+    # canonical is derived from duplicates.json on read, not stored
+    live = read_dataset(directory).drop(columns="canonical", errors="ignore")
+    live["deleted"] = False
+    old_parts = list(manifest.parts)
+    # Numbering continues after the old parts so the new name never collides
+    writer = PartWriter(manifest, schema, row_group_size)
+    try:
+        for start in range(0, len(live), row_group_size):
+            for row in live.iloc[start:start + row_group_size].to_dict("records"):
+                writer.write(row)
+        name = writer.commit(replace=True)
+    except BaseException:
+        writer.abort()
+        raise
+    if name is None:  # every paper was deleted
+        manifest.parts = []
+        manifest.save()
+    for part in old_parts:
+        (manifest.directory / part).unlink(missing_ok=True)
+    return name
@@ -1,7 +1,24 @@
 from math import log
-from collections import defaultdict
+from array import array
+from collections import Counter, defaultdict
+from itertools import compress
+import re
 import string
 import asyncio
+import os
+import pickle
+import sys
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from metadata import Filter, MetadataColumns
+from vectors import DenseIndex, cluster_labels, kmeans, lsa, term_matrix, tfidf, top_neighbours
+
+# Same token boundaries as normalize_string: runs of characters that are
+# neither whitespace nor punctuation.
+TOKEN_PATTERN = re.compile(rf"[^\s{re.escape(string.punctuation)}]+")
 
 def update_name_scores(old: dict[str, float], new: dict[str, float]):
     for name, score in new.items():
@@ -19,19 +36,236 @@ def normalize_string(input_string: str) -> str:
     string_without_double_spaces = ' '.join(string_without_punc.split())
     return string_without_double_spaces.lower()
 
+
+def tokenize_with_offsets(text: str) -> list[tuple[str, int, int]]:
+    return [(m.group().lower(), m.start(), m.end()) for m in TOKEN_PATTERN.finditer(text)]
+
+
+# Stored next to pre-tokenized data; tokens made by a different analyzer are not reused
+ANALYZER = f"lower {TOKEN_PATTERN.pattern}"
+
+
+class TokenizedDocument(NamedTuple):
+    term_ids: np.ndarray  # distinct term ids
+    term_freqs: np.ndarray
+    token_terms: np.ndarray  # term id of every token, in order
+    token_offsets: np.ndarray  # flat (start, end) character offsets of every token
+
+
+def analyze(texts: list[str], term_ids: dict[str, int]) -> list[TokenizedDocument]:
+    """Tokenize texts as the index does, numbering unseen terms in ``term_ids``."""
+    documents = []
+    for text in texts:
+        tokens = tokenize_with_offsets(text)
+        terms = np.fromiter((term_ids.setdefault(word, len(term_ids)) for word, _, _ in tokens),
+                            dtype=np.int32, count=len(tokens))
+        offsets = np.fromiter((offset for _, start, end in tokens for offset in (start, end)),
+                              dtype=np.int32, count=2 * len(tokens))
+        ids, freqs = np.unique(terms, return_counts=True)
+        documents.append(TokenizedDocument(ids.astype(np.int32), freqs.astype(np.int32), terms, offsets))
+    return documents
+
+
+def _runs(sorted_ids: np.ndarray) -> tuple[np.ndarray, list[int], list[int]]:
+    """Distinct values of a sorted array, and where each value's run starts and ends."""
+    if not len(sorted_ids):
+        return sorted_ids, [], []
+    bounds = np.flatnonzero(sorted_ids[1:] != sorted_ids[:-1]) + 1
+    return sorted_ids[np.r_[0, bounds]], np.r_[0, bounds].tolist(), np.r_[bounds, len(sorted_ids)].tolist()
+
+
+def _uint_arrays(values: np.ndarray, starts: list[int], ends: list[int]) -> list[array]:
+    """array('I') copies of values[start:end], sliced from one buffer."""
+    data = memoryview(np.asarray(values, dtype=np.uintc).tobytes())
+    size = np.dtype(np.uintc).itemsize
+    arrays = []
+    for start, end in zip(starts, ends):
+        part = array('I')
+        part.frombytes(data[start * size:end * size])
+        arrays.append(part)
+    return arrays
+
+
 class SearchEngine:
-    def __init__(self, k1: float = 1.5, b: float = 0.75):
+    def __init__(self, k1: float = 1.5, b: float = 0.75, alpha: float = 0.5):
         self._index: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
         self._documents: dict[str, str] = {}
+        # Dense integer ids, in indexing order, for the array-backed structures
+        self._doc_ids: dict[str, int] = {}
+        self._names: list[str] = []
+        self._tfidf = None
+        self._dense: DenseIndex | None = None
+        # Impact-ordered cutoff for hybrid_search: for every term in more than
+        # _impact_depth documents, the doc ids and BM25 contributions of its
+        # top _impact_depth postings. None until build_dense.
+        self._impacts: dict[str, tuple[np.ndarray, np.ndarray]] | None = None
+        self._impact_depth = 0
+        self._doc_lengths: np.ndarray | None = None
+        # Precomputed "more like this" lists: row i holds the doc ids and
+        # similarities of document i's nearest neighbours (-1 padded).
+        self._related_ids = None
+        self._related_scores = None
+        # Topic cluster of every doc id, and a short label per cluster
+        self._cluster_ids: np.ndarray | None = None
+        self._cluster_labels: list[str] = []
+        # Doc id of every document's canonical copy among near-duplicates
+        self._canonical_ids: np.ndarray | None = None
+        self._metadata: MetadataColumns | None = None
+        # Per document: token positions of each term, and the flat
+        # (start, end) character offsets of every token, for snippets.
+        self._positions: dict[str, dict[str, array]] = {}
+        self._offsets: dict[str, array] = {}
+        # Documents indexed from crawler tokens keep (vocabulary, term id of
+        # every token) until a snippet first needs their positions.
+        self._token_terms: dict[str, tuple[np.ndarray, np.ndarray]] = {}
         self._avdl: float | None = None
+        # Wall-clock seconds of the last run of each build step
+        self._build_seconds: dict[str, float] = {}
         self.k1 = k1
         self.b = b
+        self.alpha = alpha  # weight of BM25 against dense similarity in hybrid_search
         self._lock = asyncio.Lock()  # Add lock for thread-safe updates
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_index'] = dict(self._index)  # the outer default factory is a lambda
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        state['_index'] = defaultdict(lambda: defaultdict(int), state['_index'])
+        state.setdefault('_build_seconds', {})
+        state.setdefault('_token_terms', {})
+        state.setdefault('_canonical_ids', None)
+        state.setdefault('_impacts', None)
+        state.setdefault('_impact_depth', 0)
+        state.setdefault('_doc_lengths', None)
+        self.__dict__.update(state)
+        self._lock = asyncio.Lock()
+
+    def save_snapshot(self, path: str | os.PathLike) -> None:
+        """Pickle the fully built engine; written to a temp file and renamed into place."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load_snapshot(cls, path: str | os.PathLike) -> "SearchEngine":
+        with open(path, 'rb') as f:
+            engine = pickle.load(f)
+        if not isinstance(engine, cls):
+            raise TypeError(f"{path} is not a SearchEngine snapshot")
+        return engine
+
+    def approximate_nbytes(self) -> int:
+        """Rough in-memory size of the index, for memory budgeting."""
+        return sum(self.memory_breakdown().values())
+
+    def memory_breakdown(self) -> dict[str, int]:
+        """Shallow sys.getsizeof totals per structure, in bytes.
+
+        Document names are counted once, in the doc table, although the
+        postings and positions dicts share them. Term frequency ints are
+        not counted: CPython shares one object per value only for -5..256,
+        which covers nearly every frequency, and each larger one adds 28
+        bytes that would take a walk over every posting to find.
+        """
+        getsizeof = sys.getsizeof
+        term_dictionary = getsizeof(self._index) + sum(getsizeof(term) for term in self._index)
+        postings = sum(getsizeof(postings) for postings in self._index.values())
+        positions = sum(
+            getsizeof(terms) + sum(getsizeof(p) for p in terms.values())
+            for terms in self._positions.values()
+        )
+        vocabularies = {id(terms): terms for terms, _ in self._token_terms.values()}
+        positions += (
+            getsizeof(self._token_terms) + sum(terms.nbytes for terms in vocabularies.values())
+            + sum(tokens.nbytes for _, tokens in self._token_terms.values())
+        )
+        offsets = getsizeof(self._offsets) + sum(getsizeof(o) for o in self._offsets.values())
+        doc_table = (
+            getsizeof(self._documents) + getsizeof(self._doc_ids) + getsizeof(self._names)
+            + getsizeof(self._positions) + sum(getsizeof(name) for name in self._names)
+        )
+        document_text = sum(getsizeof(text) for text in self._documents.values())
+
+        def nbytes(*arrays) -> int:
+            return sum(a.nbytes for a in arrays if a is not None)
+
+        dense = 0
+        if self._dense is not None:
+            dense = nbytes(self._dense.term_vectors, self._dense.doc_vectors, self._dense.ivf.vectors)
+        impacts = nbytes(self._doc_lengths)
+        if self._impacts is not None:
+            impacts += sum(nbytes(*arrays) for arrays in self._impacts.values())
+        tfidf = 0
+        if self._tfidf is not None:
+            weighted = self._tfidf[0]
+            tfidf = nbytes(weighted.data, weighted.indices, weighted.indptr, self._tfidf[2])
+        return {
+            'term_dictionary': term_dictionary,
+            'postings': postings,
+            'positions': positions,
+            'offsets': offsets,
+            'doc_table': doc_table,
+            'document_text': document_text,
+            'tfidf': tfidf,
+            'dense': dense,
+            'impacts': impacts,
+            'related': nbytes(self._related_ids, self._related_scores),
+            'clusters': nbytes(self._cluster_ids),
+            'duplicates': nbytes(self._canonical_ids),
+        }
+
+    def stats(self, top_n: int = 20) -> dict:
+        """Vocabulary, postings distribution, memory and build-time summary."""
+        terms = list(self._index)
+        lengths = np.fromiter((len(self._index[t]) for t in terms), dtype=np.int64, count=len(terms))
+        # Bucket i holds terms whose postings length is in [2**i, 2**(i+1))
+        buckets = np.bincount(np.log2(lengths[lengths > 0]).astype(np.int64)) if len(lengths) else []
+        heaviest = np.argsort(-lengths, kind="stable")[:top_n]
+        breakdown = self.memory_breakdown()
+        return {
+            'documents': self.number_of_documents,
+            'vocabulary_size': len(terms),
+            'total_postings': int(lengths.sum()),
+            'postings_length_histogram': [
+                {'min': 1 << i, 'max': (2 << i) - 1, 'terms': int(count)} for i, count in enumerate(buckets)
+            ],
+            'heaviest_terms': [
+                {
+                    'term': terms[i],
+                    'documents': int(lengths[i]),
+                    'occurrences': sum(self._index[terms[i]].values()),
+                }
+                for i in heaviest.tolist()
+            ],
+            'memory_bytes': breakdown,
+            'total_bytes': sum(breakdown.values()),
+            'build_seconds': {step: round(seconds, 3) for step, seconds in self._build_seconds.items()},
+        }
+
     @property
     def papers(self) -> list[str]:
         return list(self._documents.keys())
 
+    @property
+    def papers_by_id(self) -> list[str]:
+        return list(self._names)
+
+    def document_lengths(self) -> list[int]:
+        """BM25 document lengths (characters), by doc id."""
+        return [len(self._documents[name]) for name in self._names]
+
+    def iter_postings(self):
+        """(term, (doc ids ascending, term frequencies)) for every indexed term."""
+        doc_ids = self._doc_ids
+        for term, postings in self._index.items():
+            if postings:
+                pairs = sorted((doc_ids[name], freq) for name, freq in postings.items())
+                yield term, ([doc_id for doc_id, _ in pairs], [freq for _, freq in pairs])
+
     @property
     def number_of_documents(self) -> int:
         return len(self._documents)
@@ -50,54 +284,435 @@ class SearchEngine:
         n_kw = len(self.get_names(kw))
         return log((N - n_kw + 0.5) / (n_kw + 0.5) + 1)
     
-    def bm25(self, kw: str) -> dict[str, float]:
+    def bm25(self, kw: str, mask: np.ndarray | None = None) -> dict[str, float]:
+        postings = self.get_names(kw)
+        if mask is not None:
+            postings = self._allowed_postings(postings, mask, np.flatnonzero(mask))
+        return self._bm25_scores(kw, postings)
+
+    def _bm25_scores(self, kw: str, postings: dict[str, int]) -> dict[str, float]:
         result = {}
         idf_score = self.idf(kw)
         avdl = self.avdl
 
-        for name, freq in self.get_names(kw).items():
+        for name, freq in postings.items():
             numerator = freq * (self.k1 + 1)
             denominator = freq + self.k1 * (1 - self.b + self.b * len(self._documents[name]) / avdl)
             result[name] = idf_score * numerator / denominator
         
         return result
+
+    def _allowed_postings(self, postings: dict[str, int], mask: np.ndarray, allowed: np.ndarray) -> dict[str, int]:
+        """The postings of the doc ids a filter mask allows; allowed is np.flatnonzero(mask)."""
+        if len(allowed) < len(postings):
+            # Selective filter: probe the postings once per allowed paper
+            names = (self._names[doc_id] for doc_id in allowed.tolist())
+            return {name: postings[name] for name in names if name in postings}
+        doc_ids = np.fromiter(map(self._doc_ids.__getitem__, postings), dtype=np.int64, count=len(postings))
+        return dict(compress(postings.items(), mask[doc_ids].tolist()))
     
-    def search(self, query: str) -> dict[str, float]:
-        keywords = normalize_string(query).split(" ")
+    def _bm25_weights(self, kw: str, freqs: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        # bm25() over arrays of term frequencies and document lengths
+        norms = self.k1 * (1 - self.b + self.b * lengths / self.avdl)
+        return self.idf(kw) * freqs * (self.k1 + 1) / (freqs + norms)
+
+    def _term_impacts(self, kw: str) -> tuple[np.ndarray, np.ndarray]:
+        """Doc ids and BM25 contributions of every posting of kw."""
+        postings = self.get_names(kw)
+        doc_ids = np.fromiter(map(self._doc_ids.__getitem__, postings), dtype=np.int32, count=len(postings))
+        freqs = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+        return doc_ids, self._bm25_weights(kw, freqs, self._doc_lengths[doc_ids]).astype(np.float32)
+
+    def search(self, query: str, filters: list[Filter] | None = None) -> dict[str, float]:
+        return self._search(normalize_string(query).split(" "), self.filter_mask(filters))
+
+    def _search(self, keywords: list[str], mask: np.ndarray | None) -> dict[str, float]:
+        if mask is not None:
+            allowed = np.flatnonzero(mask)
+            if keywords == [""]:
+                # Filter-only query: every matching paper, unranked
+                return {self._names[doc_id]: 0.0 for doc_id in allowed.tolist()}
+
         name_scores: dict[str, float] = {}
         for kw in keywords:
-            kw_names_score = self.bm25(kw)
-            name_scores = update_name_scores(name_scores, kw_names_score)
+            postings = self.get_names(kw)
+            if mask is not None:
+                postings = self._allowed_postings(postings, mask, allowed)
+            name_scores = update_name_scores(name_scores, self._bm25_scores(kw, postings))
         
         return name_scores
 
+    def index_metadata(self, records: dict[str, dict]) -> None:
+        """Attach title/authors/journal/year/doi records to indexed papers."""
+        start = time.perf_counter()
+        self._metadata = MetadataColumns([records.get(name) for name in self._names])
+        self._build_seconds['metadata'] = time.perf_counter() - start
+
+    def filter_mask(self, filters: list[Filter] | None) -> np.ndarray | None:
+        """Boolean mask over doc ids of the papers passing every filter."""
+        if not filters:
+            return None
+        if self._metadata is None:
+            return np.zeros(len(self._names), dtype=bool)
+        return self._metadata.mask(filters)
+
+    def metadata(self, name: str) -> dict:
+        if self._metadata is None or name not in self._doc_ids:
+            return {}
+        return self._metadata.row(self._doc_ids[name])
+
+    def facets(self, names) -> dict[str, list[tuple[str, int]]]:
+        if self._metadata is None:
+            return {}
+        ids = np.fromiter((self._doc_ids[name] for name in names), dtype=np.int64)
+        return self._metadata.facets(ids)
+
+    def _weighted_terms(self):
+        if self._tfidf is None:
+            matrix, vocabulary = term_matrix(self._index, self._doc_ids)
+            weighted, idf = tfidf(matrix)
+            self._tfidf = (weighted, vocabulary, idf)
+        return self._tfidf
+
+    def build_dense(self, dim: int = 128, n_lists: int | None = None, impact_depth: int = 1000) -> None:
+        """Build the LSA index and the impact-ordered postings hybrid_search uses."""
+        start = time.perf_counter()
+        weighted, vocabulary, idf = self._weighted_terms()
+        self._dense = DenseIndex(weighted, vocabulary, idf, dim=dim, n_lists=n_lists)
+        self._build_impacts(impact_depth)
+        self._build_seconds['dense'] = time.perf_counter() - start
+
+    def _build_impacts(self, depth: int) -> None:
+        # Terms in at most depth documents are cheap to score in full per query
+        self._doc_lengths = np.array(self.document_lengths(), dtype=np.float32)
+        self._impacts = {}
+        for term, postings in self._index.items():
+            if len(postings) <= depth:
+                continue
+            doc_ids, impacts = self._term_impacts(term)
+            top = np.argpartition(-impacts, depth)[:depth]
+            self._impacts[term] = (doc_ids[top], impacts[top])
+        self._impact_depth = depth
+
+    def build_related(self, k: int = 10) -> None:
+        start = time.perf_counter()
+        weighted, _, _ = self._weighted_terms()
+        self._related_ids, self._related_scores = top_neighbours(weighted, k=k)
+        self._build_seconds['related'] = time.perf_counter() - start
+
+    def build_clusters(self, n_clusters: int = 20, dim: int = 100) -> None:
+        start = time.perf_counter()
+        weighted, vocabulary, _ = self._weighted_terms()
+        if self._dense is not None:
+            vectors = self._dense.doc_vectors
+        else:
+            _, vectors = lsa(weighted, dim=dim)
+        _, self._cluster_ids = kmeans(vectors, n_clusters)
+        self._cluster_labels = cluster_labels(weighted, self._cluster_ids, vocabulary)
+        self._build_seconds['clusters'] = time.perf_counter() - start
+
+    def cluster_of(self, name: str) -> int | None:
+        if self._cluster_ids is None or name not in self._doc_ids:
+            return None
+        return int(self._cluster_ids[self._doc_ids[name]])
+
+    def cluster_counts(self, names) -> list[tuple[int, str, int]]:
+        """Count matching documents per topic cluster, largest first."""
+        if self._cluster_ids is None:
+            return []
+        ids = np.fromiter((self._doc_ids[name] for name in names), dtype=np.int64)
+        counts = np.bincount(self._cluster_ids[ids], minlength=len(self._cluster_labels))
+        return [
+            (int(cluster), self._cluster_labels[cluster], int(counts[cluster]))
+            for cluster in np.argsort(-counts, kind="stable")
+            if counts[cluster]
+        ]
+
+    def index_duplicates(self, canonical: dict[str, str]) -> None:
+        """Group near-duplicate papers under their canonical paper (see crawler.py --dedup)."""
+        canonical_ids = np.arange(len(self._names), dtype=np.int64)
+        for name, canonical_name in canonical.items():
+            if name in self._doc_ids and canonical_name in self._doc_ids:
+                canonical_ids[self._doc_ids[name]] = self._doc_ids[canonical_name]
+        grouped = (canonical_ids != np.arange(len(self._names))).any()
+        self._canonical_ids = canonical_ids if grouped else None
+
+    def duplicates_of(self, name: str) -> list[str]:
+        """The other papers in a paper's near-duplicate group."""
+        if self._canonical_ids is None or name not in self._doc_ids:
+            return []
+        group = self._canonical_ids[self._doc_ids[name]]
+        return [self._names[doc_id] for doc_id in np.flatnonzero(self._canonical_ids == group).tolist()
+                if self._names[doc_id] != name]
+
+    def collapse_duplicates(self, scores: dict[str, float]) -> dict[str, float]:
+        """Keep only the best-scoring paper of each near-duplicate group, in the original order."""
+        if self._canonical_ids is None or not scores:
+            return scores
+        names = list(scores)
+        groups = self._canonical_ids[np.fromiter((self._doc_ids[name] for name in names), dtype=np.int64)]
+        values = np.fromiter(scores.values(), dtype=np.float64, count=len(names))
+        # Highest score first; np.unique keeps the first index of each group
+        order = np.argsort(-values, kind="stable")
+        _, first = np.unique(groups[order], return_index=True)
+        if len(first) == len(names):
+            return scores
+        keep = np.zeros(len(names), dtype=bool)
+        keep[order[first]] = True
+        return {name: scores[name] for name, kept in zip(names, keep.tolist()) if kept}
+
+    @property
+    def has_related(self) -> bool:
+        return self._related_ids is not None
+
+    def related(self, name: str) -> dict[str, float] | None:
+        """Precomputed most similar papers, or None if unknown or not built."""
+        doc_id = self._doc_ids.get(name)
+        if doc_id is None or self._related_ids is None:
+            return None
+        return {
+            self._names[other]: float(score)
+            for other, score in zip(self._related_ids[doc_id].tolist(), self._related_scores[doc_id].tolist())
+            if other >= 0
+        }
+
+    def dense_search(
+        self,
+        query: str,
+        filters: list[Filter] | None = None,
+        k: int = 100,
+        n_probe: int = 8,
+        min_similarity: float = 0.1,
+    ) -> dict[str, float]:
+        """LSA cosine similarities of the approximate top k; empty without a dense index."""
+        if self._dense is None:
+            return {}
+        ids, similarities = self._dense_hits(query, self.filter_mask(filters), k, n_probe, min_similarity)
+        return {self._names[doc_id]: similarity for doc_id, similarity in zip(ids.tolist(), similarities.tolist())}
+
+    def _dense_hits(
+        self, query: str, mask: np.ndarray | None, k: int, n_probe: int, min_similarity: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        keywords = normalize_string(query).split()
+        ids, similarities = self._dense.search(keywords, k=k, n_probe=n_probe)
+        keep = similarities >= min_similarity
+        if mask is not None:
+            keep &= mask[ids]
+        return ids[keep], similarities[keep]
+
+    def hybrid_search(
+        self,
+        query: str,
+        filters: list[Filter] | None = None,
+        k: int = 100,
+        n_probe: int = 8,
+        min_similarity: float = 0.1,
+        alpha: float | None = None,
+    ) -> dict[str, float]:
+        """Fuse max-normalised BM25 scores with LSA cosine similarities.
+
+        Only the dense top k and an approximate BM25 top k are scored, so at
+        most 2k papers come back. The BM25 top k is taken from the
+        impact-ordered postings of common terms and rescored exactly.
+        Selective filters (no more papers than the impact depth) and
+        filter-only queries score their papers exhaustively instead. Falls
+        back to plain BM25 when no dense index has been built or alpha is 1.
+        """
+        alpha = self.alpha if alpha is None else alpha
+        if self._dense is None or alpha >= 1:
+            return self.search(query, filters)
+
+        keywords = normalize_string(query).split(" ")
+        mask = self.filter_mask(filters)
+        dense_ids, similarities = self._dense_hits(query, mask, k, n_probe, min_similarity)
+        if (
+            self._impacts is None
+            or keywords == [""]
+            or mask is not None and np.count_nonzero(mask) <= self._impact_depth
+        ):
+            lexical = self._search(keywords, mask)
+        else:
+            lexical = self._rescore(keywords, np.union1d(self._impact_top_k(keywords, mask, k), dense_ids))
+
+        top_lexical = max(lexical.values(), default=0.0) or 1.0
+        fused = {name: alpha * score / top_lexical for name, score in lexical.items()}
+        for doc_id, similarity in zip(dense_ids.tolist(), similarities.tolist()):
+            name = self._names[doc_id]
+            fused[name] = fused.get(name, 0.0) + (1 - alpha) * similarity
+
+        return fused
+
+    def _impact_top_k(self, keywords: list[str], mask: np.ndarray | None, k: int) -> np.ndarray:
+        """Doc ids of the top k by BM25 over each common term's top postings only."""
+        scores = np.zeros(len(self._names), dtype=np.float32)
+        for kw in keywords:
+            doc_ids, impacts = self._impacts.get(kw) or self._term_impacts(kw)
+            scores[doc_ids] += impacts
+        if mask is not None:
+            scores[~mask] = 0
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k)[:k]]
+        return hits
+
+    def _rescore(self, keywords: list[str], doc_ids: np.ndarray) -> dict[str, float]:
+        """Exact BM25 scores of the given doc ids."""
+        names = [self._names[doc_id] for doc_id in doc_ids.tolist()]
+        lengths = self._doc_lengths[doc_ids]
+        scores = np.zeros(len(names))
+        for kw in keywords:
+            postings = self.get_names(kw)
+            freqs = np.fromiter((postings.get(name, 0) for name in names), dtype=np.float32, count=len(names))
+            scores += self._bm25_weights(kw, freqs, lengths)
+        return dict(zip(names, scores.tolist()))
+
     async def _async_index(self, name: str, content: str) -> None:
+        if name not in self._doc_ids:
+            self._doc_ids[name] = len(self._names)
+            self._names.append(name)
         self._documents[name] = content
-        words = normalize_string(content).split(" ")
-        word_counts = defaultdict(int)
+        positions: dict[str, array] = defaultdict(lambda: array('I'))
+        offsets = array('I')
+
+        # Record positions and offsets locally first
+        for i, (word, start, end) in enumerate(tokenize_with_offsets(content)):
+            positions[word].append(i)
+            offsets.append(start)
+            offsets.append(end)
+        self._positions[name] = dict(positions)
+        self._token_terms.pop(name, None)
+        self._offsets[name] = offsets
 
-        # Counts freq locally first
-        for word in words:
-            word_counts[word] += 1
-        
         # Update index atomically
         async with self._lock:
-            for word, count in word_counts.items():
-                self._index[word][name] += count
+            for word, word_positions in positions.items():
+                self._index[word][name] += len(word_positions)
 
     async def async_bulk_index(self, documents: list[tuple[str, str]]):
+        start = time.perf_counter()
         tasks = [self._async_index(name, content) for name, content in documents]
         await asyncio.gather(*tasks)
+        self._build_seconds['index'] = time.perf_counter() - start
 
         self._avdl = None
+        self._tfidf = None
+        self._impacts = None
     
     def bulk_index(self, documents: list[tuple[str, str]]) -> None:
         asyncio.run(self.async_bulk_index(documents))
+
+    def bulk_index_tokenized(
+        self, documents: list[tuple[str, str]], terms: list[str], tokenized: list[TokenizedDocument]
+    ) -> None:
+        """Index documents already run through analyze(), e.g. by the crawler.
+
+        ``terms[i]`` is the term with id i. Postings come from sorting the
+        id arrays, so no text is tokenized, and token positions are only
+        grouped by term when a snippet needs them. Search results and
+        snippets match bulk_index on the same documents.
+        """
+        start = time.perf_counter()
+        terms = np.asarray(terms, dtype=object)
+        names = []
+        for (name, content), document in zip(documents, tokenized):
+            if name not in self._doc_ids:
+                self._doc_ids[name] = len(self._names)
+                self._names.append(name)
+            self._documents[name] = content
+            names.append(name)
+            self._positions.pop(name, None)
+            self._token_terms[name] = (terms, document.token_terms)
+            self._offsets[name] = _uint_arrays(document.token_offsets, [0], [len(document.token_offsets)])[0]
+
+        if tokenized:
+            term_ids = np.concatenate([document.term_ids for document in tokenized])
+            owners = np.repeat(np.arange(len(names)), [len(document.term_ids) for document in tokenized])
+            order = np.argsort(term_ids, kind='stable')
+            distinct, starts, ends = _runs(term_ids[order])
+            owner_names = np.asarray(names, dtype=object)[owners[order]].tolist()
+            freqs = np.concatenate([document.term_freqs for document in tokenized])[order].tolist()
+            for term, first, last in zip(terms[distinct].tolist(), starts, ends):
+                self._index[term].update(zip(owner_names[first:last], freqs[first:last]))
+        self._build_seconds['index'] = time.perf_counter() - start
+
+        self._avdl = None
+        self._tfidf = None
+        self._impacts = None
         
         
     def get_names(self, keyword: str) -> dict[str, int]:
         keyword = normalize_string(keyword)
-        return self._index[keyword]
-    
+        # .get: looking up an unknown keyword must not add it to the vocabulary
+        return self._index.get(keyword, {})
+
+    def _term_positions(self, name: str) -> dict[str, array]:
+        positions = self._positions.get(name)
+        if positions is None:
+            terms, tokens = self._token_terms[name]
+            order = np.argsort(tokens, kind='stable')
+            term_ids, starts, ends = _runs(tokens[order])
+            positions = dict(zip(terms[term_ids].tolist(), _uint_arrays(order, starts, ends)))
+            # Racing snippet threads at worst both build the same table
+            self._positions[name] = positions
+            self._token_terms.pop(name, None)
+        return positions
+
+    def snippet(
+        self, name: str, query: str, window: int = 30, max_hits: int = 64
+    ) -> list[tuple[str, bool]]:
+        """Return a query-dependent excerpt of a document as (text, highlighted) segments.
+
+        Only the stored position and offset tables are consulted, and at most
+        ``max_hits`` positions per query term, so the cost does not grow with
+        document length.
+        """
+        offsets = self._offsets.get(name)
+        if not offsets:
+            return []
+        positions = self._term_positions(name)
+        n_tokens = len(offsets) // 2
+
+        keywords = set(normalize_string(query).split())
+        hits = sorted(
+            (pos, kw) for kw in keywords for pos in positions.get(kw, array('I'))[:max_hits]
+        )
+
+        # Slide a window over the hits, preferring the span that covers the
+        # most distinct query terms, then the most hits.
+        best_start, best_key = 0, (0, 0)
+        in_window: Counter = Counter()
+        left = 0
+        for right, (pos, kw) in enumerate(hits):
+            in_window[kw] += 1
+            while pos - hits[left][0] >= window:
+                left_kw = hits[left][1]
+                in_window[left_kw] -= 1
+                if not in_window[left_kw]:
+                    del in_window[left_kw]
+                left += 1
+            key = (len(in_window), right - left + 1)
+            if key > best_key:
+                best_key, best_start = key, hits[left][0]
+
+        first = max(0, min(best_start - window // 4, n_tokens - window))
+        last = min(n_tokens, first + window) - 1
+        content = self._documents[name]
 
+        segments: list[tuple[str, bool]] = []
+        cursor = offsets[2 * first]
+        for pos, _ in hits:
+            if first <= pos <= last:
+                start, end = offsets[2 * pos], offsets[2 * pos + 1]
+                if start > cursor:
+                    segments.append((content[cursor:start], False))
+                segments.append((content[start:end], True))
+                cursor = end
+        end_of_window = offsets[2 * last + 1]
+        if end_of_window > cursor:
+            segments.append((content[cursor:end_of_window], False))
 
+        if first > 0:
+            segments.insert(0, ("… ", False))
+        if last < n_tokens - 1:
+            segments.append((" …", False))
+        return segments
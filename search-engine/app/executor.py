@@ -0,0 +1,51 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    pass
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class SearchExecutor:
+    """Runs CPU-bound searches off the event loop with admission control.
+
+    At most ``workers + queue_size`` searches are admitted at once; anything
+    beyond that is rejected immediately with Overloaded instead of queueing
+    without bound. A search still running after ``timeout`` seconds raises
+    BudgetExceeded for its caller, but keeps its slot until the worker
+    actually finishes so the admission count stays honest.
+    """
+
+    def __init__(self, workers: int = 4, queue_size: int = 32, timeout: float = 2.0):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.timeout = timeout
+        self.in_flight = 0
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.in_flight - self.workers)
+
+    def _release(self, _future) -> None:
+        self.in_flight -= 1
+
+    async def run(self, fn, *args):
+        if self.in_flight >= self.capacity:
+            raise Overloaded()
+
+        # Only touched from the event loop thread, so no lock is needed
+        self.in_flight += 1
+        future = asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise BudgetExceeded() from None
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
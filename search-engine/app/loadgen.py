@@ -0,0 +1,140 @@
+"""Replay a query log against a running server and report latency percentiles.
+
+    python loadgen.py queries.log --url http://127.0.0.1:8000 --concurrency 16 --speedup 10
+
+Only the standard library is used: each worker keeps one HTTP/1.1
+keep-alive connection open and requests are sent at their logged
+offsets divided by ``--speedup`` (0 replays as fast as possible).
+"""
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import quote, urlsplit
+
+from querylog import LoggedQuery, read_queries
+
+
+def request_path(query: LoggedQuery) -> str:
+    prefix = "" if query.corpus == "default" else f"/c/{quote(query.corpus, safe='')}"
+    if query.endpoint == "results":
+        return f"{prefix}/results/{quote(query.query, safe='')}"
+    return f"{prefix}/api/search?q={quote(query.query, safe='')}"
+
+
+class Connection:
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+
+    async def get(self, path: str) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\n\r\n".encode())
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while (line := await self.reader.readline()) not in (b"\r\n", b""):
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding") == "chunked":
+            while size := int((await self.reader.readline()).strip(), 16):
+                await self.reader.readexactly(size + 2)
+            await self.reader.readline()
+        else:
+            await self.reader.readexactly(int(headers.get("content-length", 0)))
+
+        if headers.get("connection") == "close":
+            await self.close()
+        return status
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def replay(queries: list[LoggedQuery], url: str, concurrency: int = 8, speedup: float = 1.0) -> dict:
+    parts = urlsplit(url)
+    host, port = parts.hostname or "127.0.0.1", parts.port or 80
+    queue: asyncio.Queue = asyncio.Queue()
+    for query in queries:
+        queue.put_nowait(query)
+
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    errors = 0
+    first = queries[0].timestamp if queries else 0.0
+    start = time.perf_counter()
+
+    async def worker():
+        nonlocal errors
+        connection = Connection(host, port)
+        while not queue.empty():
+            query = queue.get_nowait()
+            if speedup > 0:
+                delay = (query.timestamp - first) / speedup - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            sent = time.perf_counter()
+            try:
+                status = await connection.get(request_path(query))
+            except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                errors += 1
+                await connection.close()
+                continue
+            latencies.append(time.perf_counter() - sent)
+            statuses[status] = statuses.get(status, 0) + 1
+        await connection.close()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            f"p{p}": round(percentile(latencies, p) * 1000, 2) for p in (50, 95, 99)
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a query log against the search server")
+    parser.add_argument("log", help="Query log written with app.py --query-log")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel keep-alive connections")
+    parser.add_argument("--speedup", type=float, default=1.0,
+                        help="Replay this many times faster than logged (0: as fast as possible)")
+    parser.add_argument("--limit", type=int, help="Replay at most this many queries")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    queries = list(read_queries(args.log))[:args.limit]
+    report = asyncio.run(replay(queries, args.url, args.concurrency, args.speedup))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    latency = report["latency_ms"]
+    print(f"{report['requests']} requests in {report['seconds']}s "
+          f"({report['throughput_rps']} req/s), {report['errors']} errors, statuses {report['statuses']}")
+    print(f"latency p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import re
+from typing import NamedTuple
+
+import numpy as np
+
+# field:value, field:"quoted value" or year with a comparison operator
+FILTER_PATTERN = re.compile(
+    r'\b(?P<field>journal|year|author|doi)\s*(?P<op>>=|<=|>|<|:|=)\s*(?:"(?P<quoted>[^"]*)"|(?P<bare>\S+))',
+    re.IGNORECASE,
+)
+
+
+class Filter(NamedTuple):
+    field: str
+    op: str
+    value: str
+
+
+def parse_filters(query: str) -> tuple[str, list[Filter]]:
+    """Split a query into its free text and its metadata filters."""
+    filters = []
+    for match in FILTER_PATTERN.finditer(query):
+        op = ":" if match["op"] == "=" else match["op"]
+        value = match["quoted"] if match["quoted"] is not None else match["bare"]
+        filters.append(Filter(match["field"].lower(), op, value))
+    text = " ".join(FILTER_PATTERN.sub(" ", query).split())
+    return text, filters
+
+
+def year_of(date: str | None) -> int:
+    match = re.search(r"\b(?:19|20)\d{2}\b", date or "")
+    return int(match.group()) if match else 0
+
+
+def _encode(values: list[str]) -> tuple[np.ndarray, list[str]]:
+    dictionary: dict[str, int] = {}
+    codes = np.fromiter(
+        (dictionary.setdefault(v, len(dictionary)) if v else -1 for v in values),
+        dtype=np.int32,
+        count=len(values),
+    )
+    return codes, list(dictionary)
+
+
+def _doi_docs(dois: np.ndarray) -> dict[str, list[int]]:
+    docs: dict[str, list[int]] = {}
+    for doc_id, doi in enumerate(dois.tolist()):
+        if doi:
+            docs.setdefault(doi.casefold(), []).append(doc_id)
+    return docs
+
+
+class MetadataColumns:
+    """Dictionary-encoded per-document metadata, aligned with engine doc ids.
+
+    Missing values are coded -1 (journal), 0 (year) or "" (doi). DOIs are
+    unique per paper rather than shared, so instead of a dictionary they
+    get a casefolded DOI -> doc ids lookup.
+    """
+
+    def __init__(self, rows: list[dict | None]):
+        rows = [row or {} for row in rows]
+        self.titles = [row.get("title") or "" for row in rows]
+        self.dois = np.array([row.get("doi") or "" for row in rows], dtype=object)
+        self.doi_docs = _doi_docs(self.dois)
+        self.journal_codes, self.journals = _encode([row.get("journal") or "" for row in rows])
+        self.years = np.fromiter(
+            (row.get("year") or year_of(row.get("publication_date")) for row in rows),
+            dtype=np.int16,
+            count=len(rows),
+        )
+
+        # Multi-valued authors as a flat code array with per-document offsets
+        author_lists = [list(row["authors"]) if row.get("authors") is not None else [] for row in rows]
+        lengths = np.fromiter((len(a) for a in author_lists), dtype=np.int64, count=len(rows))
+        self.author_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.author_offsets[1:])
+        self.author_codes, self.authors = _encode([a for authors in author_lists for a in authors])
+        self.author_docs = np.repeat(np.arange(len(rows), dtype=np.int32), lengths)
+
+    def __setstate__(self, state):
+        if "doi_docs" not in state:  # snapshots saved before the lookup existed
+            state["doi_docs"] = _doi_docs(state["dois"])
+        self.__dict__.update(state)
+
+    def __len__(self) -> int:
+        return len(self.years)
+
+    def mask(self, filters: list[Filter]) -> np.ndarray:
+        """AND all filters into one boolean mask over doc ids."""
+        mask = np.ones(len(self), dtype=bool)
+        for f in filters:
+            mask &= self._filter_mask(f)
+        return mask
+
+    def _filter_mask(self, f: Filter) -> np.ndarray:
+        if f.field == "year":
+            try:
+                year = int(f.value)
+            except ValueError:
+                return np.zeros(len(self), dtype=bool)
+            compare = {
+                ":": np.equal, ">=": np.greater_equal, "<=": np.less_equal,
+                ">": np.greater, "<": np.less,
+            }[f.op]
+            return compare(self.years, year) & (self.years > 0)
+
+        # Text fields are matched against the (small) dictionaries, not per doc
+        wanted = f.value.casefold()
+        if f.field == "journal":
+            codes = [i for i, journal in enumerate(self.journals) if journal.casefold() == wanted]
+            return np.isin(self.journal_codes, codes)
+        if f.field == "author":
+            codes = [i for i, author in enumerate(self.authors) if wanted in author.casefold()]
+            mask = np.zeros(len(self), dtype=bool)
+            mask[self.author_docs[np.isin(self.author_codes, codes)]] = True
+            return mask
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.doi_docs.get(wanted, [])] = True
+        return mask
+
+    def facets(self, doc_ids: np.ndarray, limit: int = 10) -> dict[str, list[tuple[str, int]]]:
+        """Journal and year counts over the given documents, largest first."""
+        journal_codes = self.journal_codes[doc_ids]
+        journal_counts = np.bincount(journal_codes[journal_codes >= 0], minlength=len(self.journals))
+        years = self.years[doc_ids]
+        year_counts = np.bincount(years[years > 0].astype(np.int64)) if (years > 0).any() else np.zeros(0)
+
+        def top(counts, label):
+            order = np.argsort(-counts, kind="stable")[:limit]
+            return [(label(i), int(counts[i])) for i in order if counts[i]]
+
+        return {
+            "journal": top(journal_counts, lambda i: self.journals[i]),
+            "year": top(year_counts, str),
+        }
+
+    def row(self, doc_id: int) -> dict:
+        start, stop = self.author_offsets[doc_id], self.author_offsets[doc_id + 1]
+        journal = self.journal_codes[doc_id]
+        return {
+            "title": self.titles[doc_id],
+            "authors": [self.authors[c] for c in self.author_codes[start:stop]],
+            "journal": self.journals[journal] if journal >= 0 else "",
+            "year": int(self.years[doc_id]) or None,
+            "doi": self.dois[doc_id],
+        }
@@ -0,0 +1,146 @@
+import threading
+import time
+from bisect import bisect_left
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Seconds; upper bounds of the latency buckets, +Inf implied
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple) -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with an optional fixed label set."""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by one label.
+
+    Bucket arrays for every label value are allocated up front, so
+    ``observe`` is a bisect and a few integer increments under a lock.
+    """
+
+    def __init__(self, name: str, help: str, label: str, values: tuple[str, ...],
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        self._counts = {value: [0] * (len(buckets) + 1) for value in values}
+        self._sums = dict.fromkeys(values, 0.0)
+        self._lock = threading.Lock()
+
+    def observe(self, value: str, seconds: float) -> None:
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[value][index] += 1
+            self._sums[value] += seconds
+
+    def count(self, value: str) -> int:
+        return sum(self._counts[value])
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(value, list(counts), self._sums[value]) for value, counts in self._counts.items()]
+        for value, counts, total in snapshot:
+            label = f'{self.label}="{value}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound:g}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+
+def collected(name: str, help: str, samples: list[tuple[tuple[tuple[str, str], ...], float]],
+              kind: str = "gauge") -> list[str]:
+    """Exposition lines for a value read from elsewhere at scrape time."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        names = tuple(label for label, _ in labels)
+        values = tuple(label_value for _, label_value in labels)
+        lines.append(f"{name}{_format_labels(names, values)} {value:g}")
+    return lines
+
+
+STAGES = ("parse", "score", "facets", "topk", "enrich", "render")
+
+stage_seconds = Histogram(
+    "search_stage_seconds", "Time spent in each stage of serving a search.", "stage", STAGES
+)
+requests_total = Counter(
+    "http_requests_total", "HTTP requests by endpoint and status code.", ("endpoint", "status")
+)
+request_seconds_total = Counter(
+    "http_request_seconds_total", "Total time spent serving HTTP requests by endpoint.", ("endpoint",)
+)
+rejected_total = Counter(
+    "search_rejected_total", "Searches rejected before completing, by reason.", ("reason",)
+)
+papers_page_total = Counter(
+    "papers_page_cache_total", "Lookups of the rendered /papers page cache.", ("result",)
+)
+
+
+class MetricsMiddleware:
+    """Count requests and their total latency per matched endpoint."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched endpoint in the scope; unmatched
+            # paths share one label so arbitrary URLs cannot grow the series
+            endpoint = scope.get("endpoint")
+            if endpoint is None:
+                name = "unmatched"
+            else:
+                name = getattr(endpoint, "__name__", type(endpoint).__name__)
+            requests_total.inc(name, status)
+            request_seconds_total.inc(name, amount=time.perf_counter() - start)
@@ -0,0 +1,113 @@
+"""MinHash signatures over word shingles, and LSH banding to group near-duplicate papers."""
+import zlib
+
+import numpy as np
+
+from engine import normalize_string
+
+NUM_PERM = 128
+SHINGLE_SIZE = 3
+BANDS = 32  # of NUM_PERM // BANDS rows: pairs above ~0.42 estimated Jaccard usually share a band
+_HASH_SEED = 20240611
+_CHUNK = 4096
+
+
+def _permutations(num_perm: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(_HASH_SEED)
+    multipliers = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    offsets = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+    return multipliers[:, None], offsets[:, None]
+
+
+_MULTIPLIERS, _OFFSETS = _permutations(NUM_PERM)
+
+
+class _WordHashes(dict):
+    # crc32, unlike hash(), is the same in every parser process and run
+    def __missing__(self, word: str) -> int:
+        value = self[word] = zlib.crc32(word.encode())
+        return value
+
+
+_word_hashes = _WordHashes()
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """Distinct 64-bit hashes of the runs of ``size`` consecutive normalized words."""
+    words = normalize_string(text).split()
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    hashes = np.fromiter(map(_word_hashes.__getitem__, words), dtype=np.uint64, count=len(words))
+    size = min(size, len(hashes))
+    shingles = np.zeros(len(hashes) - size + 1, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for i in range(size):
+            shingles = shingles * np.uint64(0x100000001B3) + hashes[i:len(hashes) - size + 1 + i]
+    return np.unique(shingles)
+
+
+def signature(text: str, size: int = SHINGLE_SIZE) -> np.ndarray | None:
+    """MinHash signature of a text's shingle set; None for texts without words.
+
+    Each permutation is a multiply-shift hash of the 64-bit shingle hash,
+    keeping the top 32 bits; the signature is their minimum per permutation.
+    """
+    shingles = shingle_hashes(text, size)
+    if not len(shingles):
+        return None
+    minimum = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint32)
+    with np.errstate(over="ignore"):
+        for start in range(0, len(shingles), _CHUNK):
+            hashed = (_MULTIPLIERS * shingles[start:start + _CHUNK] + _OFFSETS) >> np.uint64(32)
+            np.minimum(minimum, hashed.min(axis=1).astype(np.uint32), out=minimum)
+    return minimum
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def duplicate_groups(names: list[str], signatures: np.ndarray, threshold: float = 0.5,
+                     bands: int = BANDS) -> dict[str, str]:
+    """Map each near-duplicate paper to the canonical (smallest) name of its group.
+
+    Papers whose signatures agree on every row of some band are candidates;
+    a candidate joins the band bucket's first paper if their estimated
+    similarity reaches ``threshold``. One sort per band, so the cost grows
+    as n log n rather than with the number of pairs. Papers without
+    duplicates are left out.
+    """
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    parent = list(range(n))
+
+    def root(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    mixers = np.random.default_rng(_HASH_SEED).integers(1, 2**63, size=rows, dtype=np.uint64)
+    for band in range(bands):
+        with np.errstate(over="ignore"):
+            keys = (signatures[:, band * rows:(band + 1) * rows].astype(np.uint64) * mixers).sum(axis=1)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], n]
+        for start, end in zip(starts[ends - starts > 1].tolist(), ends[ends - starts > 1].tolist()):
+            first = order[start]
+            for other in order[start + 1:end].tolist():
+                if root(first) != root(other) and similarity(signatures[first], signatures[other]) >= threshold:
+                    parent[root(other)] = root(first)
+
+    groups: dict[int, list[str]] = {}
+    for i, name in enumerate(names):
+        groups.setdefault(root(i), []).append(name)
+    return {
+        name: canonical
+        for members in groups.values() if len(members) > 1
+        for canonical in [min(members)]
+        for name in members if name != canonical
+    }
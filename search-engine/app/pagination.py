@@ -0,0 +1,44 @@
+import base64
+import heapq
+import json
+from collections.abc import Iterator
+
+
+def encode_cursor(score: float, name: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([score, name]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[float, str]:
+    score, name = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return float(score), str(name)
+
+
+def _keys_after(scores: dict[str, float], cursor: str | None):
+    # Results are ordered by (-score, name); a cursor is the last key served
+    keys = ((-score, name) for name, score in scores.items())
+    if cursor is None:
+        return keys
+    score, name = decode_cursor(cursor)
+    after = (-score, name)
+    return (key for key in keys if key > after)
+
+
+def page(scores: dict[str, float], limit: int, cursor: str | None = None) -> tuple[list[tuple[str, float]], str | None]:
+    """One page of results after ``cursor`` and the cursor for the next page.
+
+    Selects with a bounded heap (O(n log limit)) rather than sorting the
+    whole result set for every page.
+    """
+    top = heapq.nsmallest(limit + 1, _keys_after(scores, cursor))
+    items = [(name, -neg_score) for neg_score, name in top[:limit]]
+    next_cursor = encode_cursor(items[-1][1], items[-1][0]) if len(top) > limit else None
+    return items, next_cursor
+
+
+def stream(scores: dict[str, float], cursor: str | None = None) -> Iterator[tuple[str, float]]:
+    """All results after ``cursor`` in rank order, popped lazily off a heap."""
+    heap = list(_keys_after(scores, cursor))
+    heapq.heapify(heap)
+    while heap:
+        neg_score, name = heapq.heappop(heap)
+        yield name, -neg_score
@@ -0,0 +1,264 @@
+"""Per-page text, font-span statistics and page metadata of PDFs, extracted once per content version.
+
+    python search-engine/app/pdf_store.py /path/to/papers --store pdf-text
+
+The store is a dataset directory (see dataset.py) with one row per PDF
+keyed by the SHA-256 of its bytes, so a renamed or copied PDF is not
+parsed again and an edited one is. pdf_to_markdown.py, file-good-renamer.py
+and the crawler read pages from here instead of opening the PDF.
+"""
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import hashlib
+import os
+import pathlib as pl
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from dataset import Manifest, PartWriter, SourceFile
+
+DEFAULT_STORE = "pdf-text"
+
+# Same shape as PyMuPDF's page.get_text("dict") text blocks, minus geometry
+SPAN = pa.struct([("text", pa.string()), ("size", pa.float64()), ("font", pa.string())])
+BLOCK = pa.struct([("lines", pa.list_(pa.struct([("spans", pa.list_(SPAN))])))])
+FONT_STATS = pa.struct([
+    ("size", pa.float64()),
+    ("bold", pa.bool_()),
+    ("spans", pa.int32()),
+    ("characters", pa.int32()),
+    ("samples", pa.list_(pa.string())),
+])
+PAGE = pa.struct([
+    ("number", pa.int32()),
+    ("width", pa.float64()),
+    ("height", pa.float64()),
+    ("rotation", pa.int32()),
+    ("fonts", pa.list_(FONT_STATS)),
+    ("blocks", pa.list_(BLOCK)),
+])
+SCHEMA = pa.schema([
+    ("name", pa.string()),  # content hash
+    ("deleted", pa.bool_()),
+    ("title", pa.string()),
+    ("author", pa.string()),
+    ("page_texts", pa.list_(pa.string())),
+    ("pages", pa.list_(PAGE)),
+])
+
+
+def file_hash(path: str | os.PathLike) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def font_statistics(blocks: list[dict]) -> list[dict]:
+    """Span count, characters and a few samples per (size, bold) font, for spans longer than one character."""
+    fonts: dict[tuple[float, bool], dict] = {}
+    for block in blocks:
+        for line in block["lines"]:
+            for span in line["spans"]:
+                text = span["text"].strip()
+                if len(text) > 1:
+                    size, bold = round(span["size"], 1), "bold" in span["font"].lower()
+                    stats = fonts.setdefault((size, bold), {
+                        "size": size, "bold": bold, "spans": 0, "characters": 0, "samples": []
+                    })
+                    stats["spans"] += 1
+                    stats["characters"] += len(text)
+                    if len(stats["samples"]) < 5:
+                        stats["samples"].append(text)
+    return list(fonts.values())
+
+
+def block_text(blocks: list[dict]) -> str:
+    return "\n".join("".join(span["text"] for span in line["spans"]) for block in blocks for line in block["lines"])
+
+
+def extract_pdf(path: str | os.PathLike) -> dict:
+    """Parse a PDF into a store row (without its key); runs in the extraction processes."""
+    import fitz  # PyMuPDF; only extraction needs it, readers of the store do not
+
+    with fitz.open(path) as doc:
+        pages = []
+        for page in doc:
+            blocks = [
+                {"lines": [
+                    {"spans": [{"text": s["text"], "size": s["size"], "font": s.get("font", "")} for s in line["spans"]]}
+                    for line in block["lines"]
+                ]}
+                for block in page.get_text("dict")["blocks"] if "lines" in block
+            ]
+            pages.append({
+                "number": page.number + 1,
+                "width": page.rect.width,
+                "height": page.rect.height,
+                "rotation": page.rotation,
+                "fonts": font_statistics(blocks),
+                "blocks": blocks,
+            })
+        metadata = doc.metadata or {}
+    return {
+        "title": metadata.get("title") or "",
+        "author": metadata.get("author") or "",
+        "page_texts": [block_text(page["blocks"]) for page in pages],
+        "pages": pages,
+    }
+
+
+def guess_title(pdf: dict, max_words: int = 30) -> str:
+    """The first run of largest-font text on the first page, as pdftitle does.
+
+    Falls back to the PDF's own title when that run is too long to be a
+    title (pages set in a single size) or the first page has no text.
+    """
+    spans = [
+        span for block in (pdf["pages"][0]["blocks"] if pdf["pages"] else [])
+        for line in block["lines"] for span in line["spans"] if span["text"].strip()
+    ]
+    largest = max((round(span["size"], 1) for span in spans if len(span["text"].strip()) > 1), default=None)
+    words = []
+    for span in spans:
+        if round(span["size"], 1) == largest:
+            words.extend(span["text"].split())
+        elif words:
+            break
+    metadata_title = " ".join(pdf["title"].split())
+    if not words or (len(words) > max_words and metadata_title):
+        return metadata_title
+    return " ".join(words[:max_words])
+
+
+def extractions(paths: dict[str, str], workers: int):
+    """(key, path, call returning the row) per PDF in order, with at most 2 * workers extracted ahead."""
+    if workers == 1:
+        for key, path in paths.items():
+            yield key, path, partial(extract_pdf, path)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for key, path in paths.items():
+            pending.append((key, path, pool.submit(extract_pdf, path).result))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft()
+        yield from pending
+
+
+class PdfTextStore:
+    """Read and fill a PDF text store directory.
+
+    The manifest's ``files`` remember the size, mtime and hash of every
+    path looked up, so unchanged files are not hashed again.
+    """
+
+    def __init__(self, directory: str | os.PathLike = DEFAULT_STORE):
+        self.manifest = Manifest(directory)
+        self._locations: dict[str, tuple[str, int, int]] | None = None
+        self._files: dict[str, pq.ParquetFile] = {}
+
+    def key(self, path: str | os.PathLike) -> str:
+        source = str(pl.Path(path).resolve())
+        stat = os.stat(source)
+        known = self.manifest.files.get(source)
+        if known is not None and (known.size, known.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            return known.sha256
+        digest = file_hash(source)
+        self.manifest.files[source] = SourceFile(digest, stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    def _file(self, part: str) -> pq.ParquetFile:
+        if part not in self._files:
+            self._files[part] = pq.ParquetFile(self.manifest.directory / part)
+        return self._files[part]
+
+    def locations(self) -> dict[str, tuple[str, int, int]]:
+        """Content hash -> (part, row group, row within it), from the parts' name columns only."""
+        if self._locations is None:
+            self._locations = {}
+            for part in self.manifest.parts:
+                parquet = self._file(part)
+                names = iter(parquet.read(columns=["name"]).column("name").to_pylist())
+                for row_group in range(parquet.num_row_groups):
+                    for row in range(parquet.metadata.row_group(row_group).num_rows):
+                        self._locations[next(names)] = (part, row_group, row)
+        return self._locations
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.locations()
+
+    def read(self, key: str, columns: list[str] | None = None) -> dict | None:
+        location = self.locations().get(key)
+        if location is None:
+            return None
+        part, row_group, row = location
+        table = self._file(part).read_row_group(row_group, columns=columns)
+        return table.slice(row, 1).to_pylist()[0]
+
+    def page_texts(self, key: str) -> list[str] | None:
+        row = self.read(key, ["page_texts"])
+        return None if row is None else row["page_texts"]
+
+    def extract(self, paths: list[str | os.PathLike], workers: int | None = None) -> int:
+        """Add every PDF whose content is not stored yet, as one new part; returns how many were parsed."""
+        workers = workers or os.cpu_count() or 1
+        missing: dict[str, str] = {}
+        for path in paths:
+            try:
+                key = self.key(path)
+            except OSError as e:
+                print(f"Skipping {path}: {e}")
+                continue
+            if key not in self and key not in missing:
+                missing[key] = str(path)
+        # PDFs are large rows: one row group each, so readers load only the PDF they ask for
+        writer = PartWriter(self.manifest, SCHEMA, row_group_size=1)
+        try:
+            for key, path, result in extractions(missing, workers):
+                try:
+                    row = result()
+                except Exception as e:  # PyMuPDF raises its own errors for damaged files
+                    print(f"Could not extract {path}: {e}")
+                    continue
+                writer.write({"name": key, "deleted": False, **row})
+            part = writer.commit()
+        except BaseException:
+            writer.abort()
+            raise
+        if part is None:
+            self.manifest.save()  # keep the hashes of the paths looked up
+        self._locations = None
+        return writer.rows_written
+
+    def get(self, path: str | os.PathLike) -> dict | None:
+        """The stored row of a PDF, extracting it first if needed; None if it cannot be parsed.
+
+        Each extraction here commits a part of its own: for many PDFs,
+        extract() them together first and then read().
+        """
+        key = self.key(path)
+        if key not in self:
+            self.extract([path], workers=1)
+        return self.read(key)
+
+
+def paper_pdfs(papers_dir: str | os.PathLike) -> list[pl.Path]:
+    """Original PDFs under a papers directory; generated summary_*.pdf files are skipped."""
+    return sorted(
+        path for path in pl.Path(papers_dir).rglob("*.pdf") if not path.name.startswith("summary_")
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract the pages of every PDF once into a text store")
+    parser.add_argument("papers_dir", help="Directory searched recursively for PDFs")
+    parser.add_argument("--store", default=DEFAULT_STORE, help="Store directory")
+    parser.add_argument("--workers", type=int, help="Extraction processes (default: one per core; 1 extracts inline)")
+    args = parser.parse_args()
+
+    store = PdfTextStore(args.store)
+    pdfs = paper_pdfs(args.papers_dir)
+    extracted = store.extract(pdfs, args.workers)
+    print(f"Extracted {extracted} new PDFs; {len(pdfs) - extracted} were already stored")
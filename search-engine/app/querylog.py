@@ -0,0 +1,69 @@
+import logging
+import os
+import pathlib as pl
+import time
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+from typing import Iterator, NamedTuple
+
+
+class LoggedQuery(NamedTuple):
+    timestamp: float
+    latency_ms: float
+    corpus: str
+    endpoint: str
+    query: str
+
+
+class QueryLog:
+    """Append-only, size-rotated log of served queries.
+
+    One tab-separated line per query: unix time, latency in ms, corpus,
+    endpoint ("results" or "api") and the raw query. Rotation and locking
+    come from logging's RotatingFileHandler.
+    """
+
+    def __init__(self, path: str | os.PathLike, max_bytes: int = 16 << 20, backups: int = 3):
+        self.path = pl.Path(path)
+        self._logger = logging.getLogger(f"querylog.{self.path}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._handler = RotatingFileHandler(self.path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        self._logger.addHandler(self._handler)
+
+    def record(self, corpus: str, endpoint: str, query: str, seconds: float) -> None:
+        query = " ".join(query.split())  # tabs and newlines would break the line format
+        self._logger.info(f"{time.time():.3f}\t{seconds * 1000:.2f}\t{corpus}\t{endpoint}\t{query}")
+
+    def close(self) -> None:
+        self._logger.removeHandler(self._handler)
+        self._handler.close()
+
+
+def read_queries(path: str | os.PathLike) -> Iterator[LoggedQuery]:
+    """Logged queries oldest first, across rotated files."""
+    path = pl.Path(path)
+    rotated = sorted(
+        (p for p in path.parent.glob(f"{path.name}.*") if p.suffix[1:].isdigit()),
+        key=lambda p: int(p.suffix[1:]),
+        reverse=True,
+    )
+    for file in [*rotated, path]:
+        if not file.exists():
+            continue
+        with open(file, encoding="utf-8") as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t", 4)
+                if len(fields) != 5:
+                    continue
+                try:
+                    yield LoggedQuery(float(fields[0]), float(fields[1]), *fields[2:])
+                except ValueError:
+                    continue
+
+
+def most_frequent(path: str | os.PathLike, limit: int) -> list[tuple[str, str]]:
+    """The ``limit`` most often logged (corpus, query) pairs, most frequent first."""
+    counts = Counter((q.corpus, q.query) for q in read_queries(path))
+    return [key for key, _ in counts.most_common(limit)]
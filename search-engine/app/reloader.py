@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+import pathlib as pl
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from engine import SearchEngine
+
+
+@dataclass(frozen=True)
+class IndexGeneration:
+    engine: SearchEngine
+    generation: int
+    path: pl.Path | None
+    loaded_at: float
+    load_seconds: float
+    nbytes: int = 0
+
+
+class IndexReloader:
+    """Holds the active index generation and hot-swaps in rebuilt ones.
+
+    The index file is polled; once a changed file has stopped changing for
+    one interval it is loaded on a worker thread and the ``current``
+    reference is replaced in a single assignment. Requests that already
+    took a reference keep using the old generation until they finish.
+    """
+
+    def __init__(self, loader: Callable[[pl.Path], SearchEngine], path: str | os.PathLike | None = None,
+                 interval: float = 10.0):
+        self.loader = loader
+        self.path = pl.Path(path) if path is not None else None
+        self.interval = interval
+        self.current = IndexGeneration(SearchEngine(), 0, None, time.time(), 0.0)
+        self.reloading = False
+        self.last_error: str | None = None
+        self._loaded_signature = None
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self) -> IndexGeneration:
+        signature = self._signature()
+        start = time.perf_counter()
+        engine = self.loader(self.path)
+        self.current = IndexGeneration(
+            engine, self.current.generation + 1, self.path, time.time(), time.perf_counter() - start,
+            engine.approximate_nbytes()
+        )
+        self._loaded_signature = signature
+        return self.current
+
+    async def watch(self) -> None:
+        pending = None
+        while True:
+            await asyncio.sleep(self.interval)
+            signature = self._signature()
+            if signature is None or signature == self._loaded_signature:
+                pending = None
+                continue
+            if signature != pending:
+                pending = signature  # still being written; check again next time
+                continue
+
+            self.reloading = True
+            try:
+                generation = await asyncio.to_thread(self.load)
+                self.last_error = None
+                logging.info(
+                    f"Loaded index generation {generation.generation} from {self.path} "
+                    f"in {generation.load_seconds:.1f}s"
+                )
+            except Exception as e:
+                # Keep serving the previous generation; retry only if the file changes again
+                self._loaded_signature = signature
+                self.last_error = str(e)
+                logging.error(f"Failed to reload index {self.path}: {e}")
+            finally:
+                self.reloading = False
+                pending = None
+
+    def status(self) -> dict:
+        current = self.current
+        return {
+            'generation': current.generation,
+            'path': str(current.path) if current.path else None,
+            'documents': current.engine.number_of_documents,
+            'approximate_bytes': current.nbytes,
+            'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(current.loaded_at)),
+            'load_seconds': round(current.load_seconds, 3),
+            'reloading': self.reloading,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,157 @@
+import email.utils
+import mimetypes
+import os
+import re
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from catalog import FileInfo
+
+CHUNK_SIZE = 256 * 1024
+RANGE_PATTERN = re.compile(r"\s*bytes\s*=\s*(?P<first>\d*)\s*-\s*(?P<last>\d*)\s*", re.IGNORECASE)
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Parse a single "bytes=" range into an inclusive (start, end).
+
+    Returns None when the header should be ignored (multiple or malformed
+    ranges); raises ValueError when the range cannot be satisfied.
+    """
+    match = RANGE_PATTERN.fullmatch(header)
+    if match is None or not (match["first"] or match["last"]):
+        return None
+    if not match["first"]:
+        suffix = int(match["last"])
+        if not suffix or not size:
+            raise ValueError("Range not satisfiable")
+        return max(0, size - suffix), size - 1
+
+    start = int(match["first"])
+    end = min(int(match["last"]), size - 1) if match["last"] else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+class PaperFileResponse(Response):
+    """Serve a catalogued file with ETag/304, single byte ranges and zero-copy.
+
+    The catalog only rescans folders whose mtime changed, so it does not
+    see files rewritten in place. Conditional requests therefore stat the
+    path before answering 304, and anything else stats the opened file and
+    sends its current size and validators; a file removed since is a 404.
+    Bodies go out
+    through the ASGI zero-copy (sendfile) or pathsend extensions when the
+    server offers them, and as chunked reads otherwise.
+    """
+
+    def __init__(self, info: FileInfo, max_age: int = 3600):
+        self.info = info
+        self.status_code = 200
+        self.background = None
+        self.media_type = mimetypes.guess_type(info.path.name)[0] or "application/octet-stream"
+        self.init_headers({
+            "etag": info.etag,
+            "last-modified": email.utils.formatdate(info.mtime_ns / 1e9, usegmt=True),
+            "cache-control": f"public, max-age={max_age}",
+            "accept-ranges": "bytes",
+            "content-type": self.media_type,
+        })
+
+    def _revalidate(self, stat: os.stat_result) -> None:
+        if (stat.st_size, stat.st_mtime_ns) == (self.info.size, self.info.mtime_ns):
+            return
+        self.info = FileInfo(self.info.path, stat.st_size, stat.st_mtime_ns)
+        self.headers["etag"] = self.info.etag
+        self.headers["last-modified"] = email.utils.formatdate(self.info.mtime_ns / 1e9, usegmt=True)
+
+    def _not_modified(self, request_headers: Headers) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or self.info.etag in tags
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+            return since is not None and int(self.info.mtime_ns / 1e9) <= since.timestamp()
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request_headers = Headers(scope=scope)
+        try:
+            if "if-none-match" in request_headers or "if-modified-since" in request_headers:
+                self._revalidate(await anyio.to_thread.run_sync(os.stat, self.info.path))
+        except FileNotFoundError:
+            await Response(status_code=404)(scope, receive, send)
+            return
+        try:
+            not_modified = self._not_modified(request_headers)
+        except (TypeError, ValueError):
+            not_modified = False
+        if not_modified:
+            self.status_code = 304
+            del self.headers["content-type"]
+            await self._send_start(send)
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        try:
+            fd = await anyio.to_thread.run_sync(os.open, self.info.path, os.O_RDONLY)
+        except FileNotFoundError:
+            await Response(status_code=404)(scope, receive, send)
+            return
+        try:
+            await self._send_file(fd, request_headers, scope, receive, send)
+        finally:
+            os.close(fd)
+
+    async def _send_file(self, fd: int, request_headers: Headers, scope: Scope, receive: Receive,
+                         send: Send) -> None:
+        self._revalidate(os.fstat(fd))
+        size = self.info.size
+        start, end = 0, size - 1
+
+        http_range = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if http_range and (if_range is None or if_range == self.info.etag):
+            try:
+                byte_range = parse_range(http_range, size)
+            except ValueError:
+                response = Response(status_code=416, headers={"content-range": f"bytes */{size}"})
+                await response(scope, receive, send)
+                return
+            if byte_range is not None:
+                start, end = byte_range
+                self.status_code = 206
+                self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+        length = end - start + 1 if size else 0
+        self.headers["content-length"] = str(length)
+        await self._send_start(send)
+        if scope["method"].upper() == "HEAD" or not length:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopy" in extensions:
+            await send({"type": "http.response.zerocopy", "file": fd, "offset": start, "count": length})
+        elif "http.response.pathsend" in extensions and self.status_code == 200:
+            await send({"type": "http.response.pathsend", "path": str(self.info.path)})
+        else:
+            # Read from the descriptor that was stat'ed, even if the path is replaced meanwhile
+            offset, remaining = start, length
+            while remaining:
+                chunk = await anyio.to_thread.run_sync(os.pread, fd, min(CHUNK_SIZE, remaining), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining:
+                await send({"type": "http.response.body", "body": b""})
+
+    async def _send_start(self, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
@@ -0,0 +1,98 @@
+// Client-side BM25 over an index written by static_export.py.
+// Only meta.json, docs.json.gz and the shards for the query's terms are fetched.
+(function () {
+    // Same normalisation as normalize_string in engine.py
+    const PUNCTUATION = /[!"#$%&'()*+,\-./:;<=>?@[\\\]^_`{|}~]/g;
+    const KEY_CHARACTER = /^[a-z0-9]$/;
+
+    function tokenize(text) {
+        return text.replace(PUNCTUATION, " ").toLowerCase().split(/\s+/).filter(Boolean);
+    }
+
+    function shardKey(characters) {
+        return characters
+            .map((c) => (KEY_CHARACTER.test(c) ? c : "_" + c.codePointAt(0).toString(16)))
+            .join("");
+    }
+
+    async function fetchJson(url) {
+        const response = await fetch(url);
+        if (!response.ok) {
+            throw new Error(`${url}: ${response.status}`);
+        }
+        let bytes = new Uint8Array(await response.arrayBuffer());
+        // Hosts that send Content-Encoding: gzip have already inflated the body
+        if (bytes[0] === 0x1f && bytes[1] === 0x8b) {
+            const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"));
+            bytes = new Uint8Array(await new Response(stream).arrayBuffer());
+        }
+        return JSON.parse(new TextDecoder().decode(bytes));
+    }
+
+    class StaticSearch {
+        constructor(baseUrl = "./") {
+            this.baseUrl = baseUrl.endsWith("/") ? baseUrl : baseUrl + "/";
+            this.shards = new Map();
+        }
+
+        async load() {
+            this.meta = await fetchJson(this.baseUrl + "meta.json");
+            this.shardKeys = new Set(this.meta.shards);
+            this.docs = await fetchJson(this.baseUrl + "docs.json.gz");
+            return this;
+        }
+
+        shardFor(term) {
+            const characters = Array.from(term);
+            for (let n = Math.min(characters.length, this.meta.max_prefix_length); n > 0; n--) {
+                const key = shardKey(characters.slice(0, n));
+                if (this.shardKeys.has(key)) {
+                    return key;
+                }
+            }
+            return null;
+        }
+
+        async postings(term) {
+            const key = this.shardFor(term);
+            if (key === null) {
+                return null;
+            }
+            if (!this.shards.has(key)) {
+                this.shards.set(key, fetchJson(`${this.baseUrl}shards/${key}.json.gz`));
+            }
+            const shard = await this.shards.get(key);
+            return shard[term] || null;
+        }
+
+        async search(query, k = 10) {
+            const { documents, avdl, k1, b } = this.meta;
+            const lengths = this.docs.lengths;
+            const lists = await Promise.all(tokenize(query).map((term) => this.postings(term)));
+            const scores = new Map();
+
+            for (const list of lists) {
+                if (!list) {
+                    continue;
+                }
+                const [gaps, frequencies] = list;
+                const idf = Math.log((documents - gaps.length + 0.5) / (gaps.length + 0.5) + 1);
+                let docId = 0;
+                for (let i = 0; i < gaps.length; i++) {
+                    docId += gaps[i];
+                    const tf = frequencies[i];
+                    const score = (idf * tf * (k1 + 1)) / (tf + k1 * (1 - b + (b * lengths[docId]) / avdl));
+                    scores.set(docId, (scores.get(docId) || 0) + score);
+                }
+            }
+
+            const names = this.docs.names;
+            return Array.from(scores)
+                .sort((x, y) => y[1] - x[1] || (names[x[0]] < names[y[0]] ? -1 : 1))
+                .slice(0, k)
+                .map(([docId, score]) => ({ name: names[docId], title: this.docs.titles[docId], score }));
+        }
+    }
+
+    window.StaticSearch = StaticSearch;
+})();
@@ -0,0 +1,135 @@
+import argparse
+import gzip
+import json
+import os
+import pathlib as pl
+import shutil
+import string
+
+from jinja2 import Environment, FileSystemLoader
+
+from engine import SearchEngine
+
+SHARD_KEY_CHARACTERS = set(string.ascii_lowercase + string.digits)
+
+script_dir = pl.Path(__file__).resolve().parent
+
+
+def shard_key(prefix: str) -> str:
+    """Filename-safe form of a term prefix; mirrored by shardKey in static-search.js."""
+    return "".join(c if c in SHARD_KEY_CHARACTERS else f"_{ord(c):x}" for c in prefix)
+
+
+def plan_shards(postings_lengths: dict[str, int], prefix_length: int, max_postings: int,
+                max_prefix_length: int) -> dict[str, str]:
+    """Assign every term to a prefix shard, splitting oversized shards one character deeper.
+
+    A split shard keeps only the terms exactly as long as its prefix, so a
+    client finds a term's shard by trying its longest prefix first.
+    """
+    assignment = {}
+    pending = [(prefix_length, list(postings_lengths))]
+    while pending:
+        length, terms = pending.pop()
+        groups: dict[str, list[str]] = {}
+        for term in terms:
+            groups.setdefault(term[:length], []).append(term)
+        for prefix, members in groups.items():
+            size = sum(postings_lengths[t] for t in members)
+            longer = [t for t in members if len(t) > length]
+            if size > max_postings and length < max_prefix_length and longer:
+                pending.append((length + 1, longer))
+                members = [t for t in members if len(t) <= length]
+            for term in members:
+                assignment[term] = prefix
+    return assignment
+
+
+def write_json(path: pl.Path, data, compress: bool = True) -> int:
+    body = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+    if compress:
+        body = gzip.compress(body, compresslevel=9, mtime=0)
+    path.write_bytes(body)
+    return len(body)
+
+
+def export_static(
+    engine: SearchEngine,
+    out_dir: str | os.PathLike,
+    prefix_length: int = 2,
+    max_shard_postings: int = 50_000,
+    max_prefix_length: int = 4,
+) -> dict:
+    """Write a read-only copy of the BM25 index for client-side search.
+
+    Layout: ``meta.json`` (scoring parameters and shard list),
+    ``docs.json.gz`` (names, lengths and titles by doc id) and
+    ``shards/<prefix>.json.gz`` mapping each term to its delta-encoded doc
+    ids and term frequencies. A page and static-search.js that score
+    queries in the browser are copied alongside.
+    """
+    out_dir = pl.Path(out_dir)
+    shards_dir = out_dir / "shards"
+    if shards_dir.exists():
+        shutil.rmtree(shards_dir)
+    shards_dir.mkdir(parents=True)
+
+    postings = dict(engine.iter_postings())
+    assignment = plan_shards(
+        {term: len(ids) for term, (ids, _) in postings.items()}, prefix_length, max_shard_postings, max_prefix_length
+    )
+    shards: dict[str, dict[str, list]] = {}
+    for term, (ids, frequencies) in postings.items():
+        gaps = [ids[0], *(b - a for a, b in zip(ids, ids[1:]))]
+        shards.setdefault(assignment[term], {})[term] = [gaps, frequencies]
+
+    shard_bytes = {
+        shard_key(prefix): write_json(shards_dir / f"{shard_key(prefix)}.json.gz", terms)
+        for prefix, terms in sorted(shards.items())
+    }
+    docs_bytes = write_json(out_dir / "docs.json.gz", {
+        "names": engine.papers_by_id,
+        "lengths": engine.document_lengths(),
+        "titles": [engine.metadata(name).get("title", "") for name in engine.papers_by_id],
+    })
+    meta = {
+        "format": 1,
+        "documents": engine.number_of_documents,
+        "avdl": engine.avdl if engine.number_of_documents else 0.0,
+        "k1": engine.k1,
+        "b": engine.b,
+        "max_prefix_length": max(map(len, shards), default=prefix_length),
+        "shards": sorted(shard_bytes),
+    }
+    write_json(out_dir / "meta.json", meta, compress=False)
+
+    shutil.copyfile(script_dir / "static" / "js" / "static-search.js", out_dir / "static-search.js")
+    shutil.copyfile(script_dir / "static" / "css" / "styles.css", out_dir / "styles.css")
+    templates = Environment(loader=FileSystemLoader(script_dir / "templates"), autoescape=True)
+    page = templates.get_template("static_search.html").render(documents=engine.number_of_documents)
+    (out_dir / "index.html").write_text(page, encoding="utf-8")
+
+    sizes = sorted(shard_bytes.values())
+    return {
+        "terms": len(postings),
+        "shards": len(sizes),
+        "shard_bytes_total": sum(sizes),
+        "shard_bytes_max": sizes[-1] if sizes else 0,
+        "docs_bytes": docs_bytes,
+    }
+
+
+if __name__ == "__main__":
+    from app import load_engine
+
+    parser = argparse.ArgumentParser(description="Export the search index for a static host")
+    parser.add_argument("--data-path", required=True, help="Crawler dataset directory, index.parquet or engine .snapshot")
+    parser.add_argument("--out", required=True, help="Directory to write the static site into")
+    parser.add_argument("--prefix-length", type=int, default=2, help="Term prefix characters per shard")
+    parser.add_argument("--max-shard-postings", type=int, default=50_000,
+                        help="Split shards holding more postings than this one character deeper")
+    args = parser.parse_args()
+
+    engine = load_engine(pl.Path(args.data_path), related_k=0)
+    summary = export_static(engine, args.out, args.prefix_length, args.max_shard_postings)
+    print(json.dumps(summary, indent=2))
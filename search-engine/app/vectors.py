@@ -0,0 +1,264 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import svds
+
+
+def term_matrix(
+    index: dict[str, dict[str, int]], doc_ids: dict[str, int]
+) -> tuple[sparse.csr_matrix, dict[str, int]]:
+    """Build a documents x terms frequency matrix from the inverted index."""
+    vocabulary: dict[str, int] = {}
+    rows: list[int] = []
+    cols: list[int] = []
+    freqs: list[int] = []
+    for term, postings in index.items():
+        if not term or not postings:
+            continue
+        col = vocabulary.setdefault(term, len(vocabulary))
+        for name, freq in postings.items():
+            rows.append(doc_ids[name])
+            cols.append(col)
+            freqs.append(freq)
+
+    matrix = sparse.csr_matrix(
+        (np.asarray(freqs, dtype=np.float32), (rows, cols)),
+        shape=(len(doc_ids), len(vocabulary)),
+    )
+    return matrix, vocabulary
+
+
+def tfidf(matrix: sparse.csr_matrix) -> tuple[sparse.csr_matrix, np.ndarray]:
+    """Sublinear tf-idf weighting with L2-normalised rows."""
+    n_docs = matrix.shape[0]
+    df = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    idf = (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32)
+
+    weighted = matrix.copy()
+    weighted.data = 1 + np.log(weighted.data)
+    weighted = weighted.multiply(idf).tocsr()
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms).dot(weighted).tocsr(), idf
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk_size):
+        chunk = vectors[start:start + chunk_size]
+        labels[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+    return labels
+
+
+def kmeans(
+    vectors: np.ndarray,
+    n_clusters: int,
+    batch_size: int = 1024,
+    iterations: int = 100,
+    seed: int = 0,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Spherical mini-batch k-means over L2-normalised rows.
+
+    Returns the centroids and the cluster label of every row.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    n_clusters = max(1, min(n_clusters, n))
+    centroids = vectors[rng.choice(n, n_clusters, replace=False)].astype(np.float32)
+    counts = np.zeros(n_clusters, dtype=np.float64)
+
+    for _ in range(iterations):
+        batch = vectors[rng.choice(n, min(batch_size, n), replace=False)]
+        nearest = np.argmax(batch @ centroids.T, axis=1)
+        batch_counts = np.bincount(nearest, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, nearest, batch)
+
+        touched = batch_counts > 0
+        counts[touched] += batch_counts[touched]
+        step = (sums[touched] - batch_counts[touched, None] * centroids[touched]) / counts[touched, None]
+        centroids[touched] += step.astype(np.float32)
+        centroids = normalize_rows(centroids)
+
+    return centroids, assign(vectors, centroids)
+
+
+def lsa(weighted: sparse.csr_matrix, dim: int = 128, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Truncated SVD of a tf-idf matrix.
+
+    Returns the term vectors used to fold queries in and the L2-normalised
+    document vectors (U * S).
+    """
+    dim = min(dim, min(weighted.shape) - 1)
+    if dim < 1:
+        raise ValueError("Corpus too small for an LSA embedding")
+    u, s, vt = svds(weighted, k=dim, random_state=seed)
+    term_vectors = np.ascontiguousarray(vt.T, dtype=np.float32)
+    doc_vectors = normalize_rows((u * s).astype(np.float32))
+    return term_vectors, doc_vectors
+
+
+def cluster_labels(
+    weighted: sparse.csr_matrix, labels: np.ndarray, vocabulary: dict[str, int], n_terms: int = 3
+) -> list[str]:
+    """Name each cluster after the heaviest terms of its mean tf-idf vector."""
+    n_clusters = int(labels.max()) + 1 if len(labels) else 0
+    membership = sparse.csr_matrix(
+        (np.ones(len(labels), dtype=np.float32), (labels, np.arange(len(labels)))),
+        shape=(n_clusters, len(labels)),
+    )
+    totals = (membership @ weighted).toarray()
+    terms = np.empty(len(vocabulary), dtype=object)
+    for term, col in vocabulary.items():
+        terms[col] = term
+
+    names = []
+    for row in totals:
+        top = np.argsort(-row)[:n_terms]
+        names.append(", ".join(terms[top[row[top] > 0]]))
+    return names
+
+
+class IVFIndex:
+    """Inverted-file approximate nearest neighbour index over unit vectors.
+
+    Vectors are stored grouped by their coarse cluster so probing a list is
+    a contiguous slice.
+    """
+
+    def __init__(self, vectors: np.ndarray, n_lists: int | None = None, seed: int = 0):
+        n = len(vectors)
+        if n_lists is None:
+            n_lists = int(4 * np.sqrt(n))
+        self.centroids, labels = kmeans(vectors, n_lists, seed=seed)
+
+        self.order = np.argsort(labels, kind="stable").astype(np.int32)
+        self.vectors = np.ascontiguousarray(vectors[self.order], dtype=np.float32)
+        self.list_offsets = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=len(self.centroids)), out=self.list_offsets[1:])
+
+    def search(self, query: np.ndarray, k: int = 10, n_probe: int = 8) -> tuple[np.ndarray, np.ndarray]:
+        n_probe = min(n_probe, len(self.centroids))
+        probes = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+        slices = [
+            np.arange(self.list_offsets[p], self.list_offsets[p + 1]) for p in probes
+        ]
+        candidates = np.concatenate(slices)
+        if not len(candidates):
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+        scores = self.vectors[candidates] @ query
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return self.order[candidates[top]], scores[top]
+
+
+class DenseIndex:
+    """LSA document embeddings (tf-idf + truncated SVD) behind an IVF index."""
+
+    def __init__(
+        self,
+        weighted: sparse.csr_matrix,
+        vocabulary: dict[str, int],
+        idf: np.ndarray,
+        dim: int = 128,
+        n_lists: int | None = None,
+        seed: int = 0,
+    ):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        # Queries are folded in through the term vectors; documents live in
+        # the same (U * S) space.
+        self.term_vectors, self.doc_vectors = lsa(weighted, dim=dim, seed=seed)
+        self.ivf = IVFIndex(self.doc_vectors, n_lists=n_lists, seed=seed)
+
+    def embed(self, keywords: list[str]) -> np.ndarray | None:
+        counts: dict[int, int] = {}
+        for kw in keywords:
+            col = self.vocabulary.get(kw)
+            if col is not None:
+                counts[col] = counts.get(col, 0) + 1
+        if not counts:
+            return None
+
+        cols = np.fromiter(counts.keys(), dtype=np.int64)
+        weights = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32))) * self.idf[cols]
+        vector = weights @ self.term_vectors[cols]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def search(self, keywords: list[str], k: int = 100, n_probe: int = 8) -> tuple[np.ndarray, np.ndarray]:
+        vector = self.embed(keywords)
+        if vector is None:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        return self.ivf.search(vector, k=k, n_probe=n_probe)
+
+
+def top_neighbours(
+    weighted: sparse.csr_matrix,
+    k: int = 10,
+    chunk_size: int = 256,
+    max_df: float = 0.01,
+    min_df_cap: int = 100,
+    candidates: int | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Approximate k nearest neighbours of every row by cosine similarity.
+
+    Only rows sharing a rare term (in at most ``max_df`` of the rows, and
+    never fewer than ``min_df_cap``) are candidates, so common terms add no
+    pairs and the work grows with rare-term overlap instead of n². The best
+    ``candidates`` (default 4k) per row by that partial score are rescored
+    with the exact cosine over all terms. Corpora below ``min_df_cap`` rows
+    get the exact neighbours.
+
+    Returns (ids, scores) arrays of shape (n_docs, k); missing neighbours
+    are padded with id -1.
+    """
+    n = weighted.shape[0]
+    k = max(0, min(k, n - 1))
+    ids = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float16)
+    if not k:
+        return ids, scores
+    candidates = max(k, candidates or 4 * k)
+
+    df = np.bincount(weighted.indices, minlength=weighted.shape[1])
+    rare_cols = df <= max(min_df_cap, max_df * n)
+    rare = weighted[:, np.flatnonzero(rare_cols)].tocsr()
+    common = weighted[:, np.flatnonzero(~rare_cols)].tocsr()
+    rare_transposed = rare.T.tocsr()
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        partial = (rare[start:stop] @ rare_transposed).tocsr()
+        lengths = np.diff(partial.indptr)
+        partial.data[partial.indices == np.repeat(np.arange(start, stop), lengths)] = 0
+
+        # Best candidates per row, padded into a (rows, candidates) block
+        width = min(candidates, int(lengths.max(initial=0)))
+        cols = np.zeros((stop - start, width), dtype=np.int64)
+        sims = np.zeros((stop - start, width), dtype=np.float32)
+        for row, (first, last) in enumerate(zip(partial.indptr[:-1].tolist(), partial.indptr[1:].tolist())):
+            values = partial.data[first:last]
+            best = np.argpartition(-values, width - 1)[:width] if last - first > width else slice(None)
+            cols[row, :len(values[best])] = partial.indices[first:last][best]
+            sims[row, :len(values[best])] = values[best]
+        found = sims > 0
+        if common.nnz and found.any():
+            rows = np.nonzero(found)[0] + start
+            sims[found] += np.asarray(common[rows].multiply(common[cols[found]]).sum(axis=1)).ravel()
+
+        sims[~found] = -1
+        top = np.argsort(-sims, axis=1, kind="stable")[:, :k]
+        top_sims = np.take_along_axis(sims, top, axis=1)
+        top_ids = np.take_along_axis(cols, top, axis=1)
+        width = top.shape[1]
+        ids[start:stop, :width] = np.where(top_sims > 0, top_ids, -1)
+        scores[start:stop, :width] = np.where(top_sims > 0, top_sims, 0)
+
+    return ids, scores
@@ -0,0 +1,79 @@
+"""Crawler throughput across parser process counts.
+
+    python benchmarks/bench_crawler.py --documents 10000 --workers 1 2 4 8 --output crawl.json
+
+Writes a seeded synthetic feed of markdown summaries once, then runs a
+full crawl into a fresh dataset directory for each worker count and
+reports docs/sec, speed-up and parallel efficiency relative to one
+worker. File reads come from the page cache after the first run, so
+the numbers isolate parsing and writing.
+"""
+import argparse
+import asyncio
+from contextlib import redirect_stdout
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import crawler  # noqa: E402
+from synthetic import markdown_summaries  # noqa: E402
+
+
+def write_feed(feed: Path, n_documents: int, seed: int) -> None:
+    for name, markdown in markdown_summaries(n_documents, seed=seed):
+        folder = feed / name
+        folder.mkdir(parents=True)
+        (folder / f"summary_{name}.md").write_text(markdown, encoding="utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure crawler docs/sec across parser process counts")
+    parser.add_argument("--documents", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        feed = Path(tmp) / "feed"
+        write_feed(feed, args.documents, args.seed)
+        for workers in args.workers:
+            dataset = Path(tmp) / f"dataset-{workers}"
+            start = time.perf_counter()
+            with redirect_stdout(sys.stderr):  # keep stdout for the JSON report
+                asyncio.run(crawler.async_main(str(feed), dataset=str(dataset), workers=workers,
+                                               batch_size=args.batch_size))
+            seconds = time.perf_counter() - start
+            runs.append({"workers": workers, "seconds": round(seconds, 3),
+                         "docs_per_second": round(args.documents / seconds, 1)})
+            print(f"{workers} workers: {runs[-1]['docs_per_second']} docs/s", file=sys.stderr)
+
+    base = next((run["docs_per_second"] for run in runs if run["workers"] == 1), runs[0]["docs_per_second"])
+    for run in runs:
+        run["speedup"] = round(run["docs_per_second"] / base, 2)
+        run["efficiency"] = round(run["speedup"] / run["workers"], 2)
+
+    report = {
+        "documents": args.documents,
+        "batch_size": args.batch_size,
+        "cpu_count": os.cpu_count(),
+        "runs": runs,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""SearchEngine benchmarks over seeded synthetic Zipf corpora.
+
+    python benchmarks/bench_engine.py --sizes 1000 10000 100000 --output bench.json
+
+Every corpus size runs in a fresh process so peak RSS is per size. Each
+run reports build throughput, tracemalloc and RSS memory, snapshot
+size and load time, and latency percentiles for 1-, 3- and 8-term
+queries, as JSON.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from engine import SearchEngine  # noqa: E402
+from synthetic import sample_queries, zipf_corpus  # noqa: E402
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def latency_summary(seconds: list[float]) -> dict:
+    ms = np.array(seconds) * 1000
+    return {
+        "mean": round(float(ms.mean()), 4),
+        "p50": round(float(np.percentile(ms, 50)), 4),
+        "p95": round(float(np.percentile(ms, 95)), 4),
+        "p99": round(float(np.percentile(ms, 99)), 4),
+        "max": round(float(ms.max()), 4),
+    }
+
+
+def bench_size(n_docs: int, args) -> dict:
+    documents, vocabulary, probabilities = zipf_corpus(
+        n_docs, args.vocabulary, args.mean_length, args.exponent, seed=args.seed
+    )
+    text_bytes = sum(len(text) for _, text in documents)
+    tokens = sum(text.count(" ") + 1 for _, text in documents)
+    rss_before = rss_bytes()
+
+    engine = SearchEngine()
+    start = time.perf_counter()
+    engine.bulk_index(documents)
+    build_seconds = time.perf_counter() - start
+    if args.dense_dim:
+        engine.build_dense(dim=args.dense_dim)
+    rss_after = rss_bytes()
+    peak_rss = peak_rss_bytes()
+    stats = engine.stats(top_n=0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "engine.snapshot"
+        start = time.perf_counter()
+        engine.save_snapshot(path)
+        save_seconds = time.perf_counter() - start
+        snapshot_bytes = path.stat().st_size
+        start = time.perf_counter()
+        SearchEngine.load_snapshot(path)
+        load_seconds = time.perf_counter() - start
+
+    queries = {}
+    for n_terms in args.query_terms:
+        sample = sample_queries(vocabulary, probabilities, args.queries, n_terms, seed=args.seed + n_terms)
+        search = engine.hybrid_search if args.dense_dim else engine.search
+        for query in sample[:10]:
+            search(query)  # warm the avdl and any lazily built state
+        timings = []
+        for query in sample:
+            start = time.perf_counter()
+            search(query)
+            timings.append(time.perf_counter() - start)
+        queries[f"{n_terms}_terms"] = latency_summary(timings)
+
+    traced_peak = None
+    if args.tracemalloc:
+        # Separate build: tracing slows allocation too much to time the first one
+        del engine
+        tracemalloc.start()
+        engine = SearchEngine()
+        engine.bulk_index(documents)
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        "documents": n_docs,
+        "tokens": tokens,
+        "text_bytes": text_bytes,
+        "vocabulary_size": stats["vocabulary_size"],
+        "total_postings": stats["total_postings"],
+        "build": {
+            "seconds": round(build_seconds, 3),
+            "docs_per_second": round(n_docs / build_seconds, 1),
+            "tokens_per_second": round(tokens / build_seconds, 1),
+        },
+        "memory": {
+            "tracemalloc_peak_bytes": traced_peak,
+            "rss_before_build_bytes": rss_before,
+            "rss_after_build_bytes": rss_after,
+            "peak_rss_bytes": peak_rss,
+            "index_bytes": stats["memory_bytes"],
+        },
+        "snapshot": {
+            "bytes": snapshot_bytes,
+            "save_seconds": round(save_seconds, 3),
+            "load_seconds": round(load_seconds, 3),
+        },
+        "query_latency_ms": queries,
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SearchEngine on synthetic Zipf corpora")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--mean-length", type=int, default=150, help="Mean tokens per document")
+    parser.add_argument("--exponent", type=float, default=1.1, help="Zipf exponent of term frequencies")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=200, help="Queries per query length")
+    parser.add_argument("--query-terms", type=int, nargs="+", default=[1, 3, 8])
+    parser.add_argument("--dense-dim", type=int, default=0, help="Also build LSA and time hybrid_search")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Build once more under tracemalloc to report the exact allocation peak")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    # A fresh interpreter per size keeps peak RSS and allocator state independent
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for n_docs in args.sizes:
+        with context.Pool(1) as pool:
+            results.append(pool.apply(bench_size, (n_docs, args)))
+        print(f"{n_docs} documents: built in {results[-1]['build']['seconds']}s", file=sys.stderr)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "parameters": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
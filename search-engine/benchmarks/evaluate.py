@@ -0,0 +1,204 @@
+"""Ranking quality against speed for the approximate search modes.
+
+    python benchmarks/evaluate.py --synthetic 10000 --modes hybrid dense:n_probe=4
+    python benchmarks/evaluate.py --data-path index.parquet --query-log queries.log \\
+        --modes hybrid:alpha=0.7 dense --qrels judgments.json
+
+Every query runs through exhaustive BM25 (the reference) and each mode,
+with its metadata filters (year:, author:, ...) split off as the server
+does.
+Modes are ``name[:param=value,...]`` where name is a SearchEngine method
+alias from MODES and the parameters are passed through as keyword
+arguments. overlap@k is measured against the BM25 top k; nDCG@k against
+graded judgments when --qrels is given (JSON of query -> {paper: grade}),
+otherwise against the BM25 ranking with gain k - rank.
+"""
+import argparse
+import heapq
+import json
+import math
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from engine import SearchEngine  # noqa: E402
+from metadata import parse_filters  # noqa: E402
+from querylog import read_queries  # noqa: E402
+from synthetic import sample_queries, zipf_corpus  # noqa: E402
+
+MODES = {
+    "bm25": lambda engine, query, filters, **params: engine.search(query, filters, **params),
+    "hybrid": lambda engine, query, filters, **params: engine.hybrid_search(query, filters=filters, **params),
+    "dense": lambda engine, query, filters, **params: engine.dense_search(query, filters=filters, **params),
+}
+
+
+def parse_mode(spec: str) -> tuple[str, dict]:
+    name, _, params = spec.partition(":")
+    if name not in MODES:
+        raise ValueError(f"Unknown mode {name!r}; expected one of {', '.join(MODES)}")
+    parsed = {}
+    for item in filter(None, params.split(",")):
+        key, _, value = item.partition("=")
+        try:
+            parsed[key] = int(value)
+        except ValueError:
+            parsed[key] = float(value)
+    return name, parsed
+
+
+def top_k(scores: dict[str, float], k: int) -> list[str]:
+    # Same order as the API: score descending, then name
+    return [name for name, _ in heapq.nsmallest(k, scores.items(), key=lambda item: (-item[1], item[0]))]
+
+
+def overlap_at_k(ranking: list[str], reference: list[str], k: int) -> float:
+    expected = reference[:k]
+    if not expected:
+        return 1.0
+    return len(set(ranking[:k]) & set(expected)) / len(expected)
+
+
+def ndcg_at_k(ranking: list[str], gains: dict[str, float], k: int) -> float:
+    ideal = sorted(gains.values(), reverse=True)[:k]
+    ideal_dcg = sum(gain / math.log2(i + 2) for i, gain in enumerate(ideal))
+    if ideal_dcg == 0:
+        return 1.0
+    dcg = sum(gains.get(name, 0.0) / math.log2(i + 2) for i, name in enumerate(ranking[:k]))
+    return dcg / ideal_dcg
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def summarize(overlaps, ndcgs, seconds, reference_seconds) -> dict:
+    ms = np.array(seconds) * 1000
+    return {
+        "overlap_at_k": round(float(np.mean(overlaps)), 4),
+        "ndcg_at_k": round(float(np.mean(ndcgs)), 4),
+        "latency_ms": {
+            "mean": round(float(ms.mean()), 4),
+            "p50": round(float(np.percentile(ms, 50)), 4),
+            "p95": round(float(np.percentile(ms, 95)), 4),
+        },
+        "speedup": round(float(np.sum(reference_seconds) / np.sum(seconds)), 2) if np.sum(seconds) else None,
+    }
+
+
+def evaluate(engine: SearchEngine, queries: list[str], modes: list[str], k: int = 10,
+             qrels: dict[str, dict[str, float]] | None = None) -> dict:
+    parsed = [(spec, *parse_mode(spec)) for spec in modes]
+    # Parsed outside the timings, as the server times parsing as its own stage
+    searches = [parse_filters(query) for query in queries]
+    for text, filters in searches[:10]:
+        engine.search(text, filters)  # warm lazily computed state before timing
+
+    reference_rankings, reference_seconds = [], []
+    for text, filters in searches:
+        scores, seconds = timed(engine.search, text, filters)
+        reference_rankings.append(top_k(scores, k))
+        reference_seconds.append(seconds)
+
+    def gains_for(i: int, query: str) -> dict[str, float]:
+        if qrels is not None:
+            return qrels.get(query, {})
+        return {name: k - rank for rank, name in enumerate(reference_rankings[i])}
+
+    results = {
+        "bm25 (exhaustive)": summarize(
+            [1.0] * len(queries),
+            [ndcg_at_k(reference_rankings[i], gains_for(i, q), k) for i, q in enumerate(queries)],
+            reference_seconds,
+            reference_seconds,
+        )
+    }
+    for spec, name, params in parsed:
+        overlaps, ndcgs, seconds = [], [], []
+        for i, query in enumerate(queries):
+            scores, elapsed = timed(MODES[name], engine, *searches[i], **params)
+            ranking = top_k(scores, k)
+            overlaps.append(overlap_at_k(ranking, reference_rankings[i], k))
+            ndcgs.append(ndcg_at_k(ranking, gains_for(i, query), k))
+            seconds.append(elapsed)
+        results[spec] = summarize(overlaps, ndcgs, seconds, reference_seconds)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare approximate search modes with exhaustive BM25")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--data-path", help="Crawler dataset directory, index.parquet or engine .snapshot")
+    source.add_argument("--synthetic", type=int, default=10_000,
+                        help="Documents in a seeded synthetic Zipf corpus (default)")
+    parser.add_argument("--queries", help="File with one query per line")
+    parser.add_argument("--query-log", help="Query log written with app.py --query-log")
+    parser.add_argument("--n-queries", type=int, default=200)
+    parser.add_argument("--query-terms", type=int, default=3, help="Terms per sampled synthetic query")
+    parser.add_argument("--qrels", help="JSON judgments: {query: {paper name: grade}}")
+    parser.add_argument("--modes", nargs="+", default=["hybrid", "dense"])
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--dense-dim", type=int, default=128, help="LSA dimensions built for dense modes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    for spec in args.modes:
+        try:
+            parse_mode(spec)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.data_path:
+        from app import load_engine
+        engine = load_engine(Path(args.data_path), dense_dim=args.dense_dim, related_k=0)
+        vocabulary = probabilities = None
+    else:
+        documents, vocabulary, probabilities = zipf_corpus(args.synthetic, seed=args.seed)
+        engine = SearchEngine()
+        engine.bulk_index(documents)
+        engine.build_dense(dim=args.dense_dim)
+
+    if args.queries:
+        queries = [line.strip() for line in open(args.queries, encoding="utf-8") if line.strip()]
+    elif args.query_log:
+        queries = list(dict.fromkeys(q.query for q in read_queries(args.query_log)))
+    elif vocabulary is not None:
+        queries = sample_queries(vocabulary, probabilities, args.n_queries, args.query_terms, seed=args.seed + 1)
+    else:
+        parser.error("--queries or --query-log is required with --data-path")
+    queries = queries[:args.n_queries]
+
+    qrels = None
+    if args.qrels:
+        with open(args.qrels, encoding="utf-8") as f:
+            qrels = json.load(f)
+        queries = [q for q in queries if q in qrels] or list(qrels)
+
+    report = {
+        "k": args.k,
+        "queries": len(queries),
+        "reference": "qrels" if qrels is not None else "exhaustive bm25",
+        "modes": evaluate(engine, queries, args.modes, args.k, qrels),
+    }
+
+    for spec, result in report["modes"].items():
+        print(f"{spec:<32} overlap@{args.k} {result['overlap_at_k']:.3f}  nDCG@{args.k} {result['ndcg_at_k']:.3f}  "
+              f"p50 {result['latency_ms']['p50']:.3f} ms  p95 {result['latency_ms']['p95']:.3f} ms  "
+              f"x{result['speedup']}", file=sys.stderr)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Seeded synthetic corpora with Zipf-distributed term frequencies."""
+import numpy as np
+
+SYLLABLES = [c + v for c in "bdfgklmnprstvz" for v in "aeiou"]
+
+
+def make_vocabulary(size: int) -> list[str]:
+    """Distinct lowercase pseudo-words; rank 0 is the shortest."""
+    words = []
+    for rank in range(size):
+        word, n = "", rank
+        while True:
+            word += SYLLABLES[n % len(SYLLABLES)]
+            n //= len(SYLLABLES)
+            if n == 0:
+                break
+        words.append(word)
+    return words
+
+
+def zipf_probabilities(size: int, exponent: float = 1.1) -> np.ndarray:
+    weights = 1.0 / np.arange(1, size + 1) ** exponent
+    return weights / weights.sum()
+
+
+def zipf_corpus(
+    n_docs: int,
+    vocabulary_size: int = 50_000,
+    mean_length: int = 150,
+    exponent: float = 1.1,
+    seed: int = 0,
+) -> tuple[list[tuple[str, str]], list[str], np.ndarray]:
+    """(name, text) documents, the vocabulary and its term probabilities.
+
+    Document lengths are Poisson around ``mean_length``; every token is an
+    independent draw from a bounded Zipf distribution over the vocabulary.
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = make_vocabulary(vocabulary_size)
+    probabilities = zipf_probabilities(vocabulary_size, exponent)
+    lengths = np.maximum(rng.poisson(mean_length, n_docs), 1)
+    tokens = rng.choice(vocabulary_size, size=int(lengths.sum()), p=probabilities)
+    words = np.array(vocabulary, dtype=object)[tokens]
+
+    documents = []
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    for i in range(n_docs):
+        documents.append((f"doc{i:06d}", " ".join(words[offsets[i]:offsets[i + 1]])))
+    return documents, vocabulary, probabilities
+
+
+def sample_queries(
+    vocabulary: list[str], probabilities: np.ndarray, n_queries: int, n_terms: int, seed: int = 1
+) -> list[str]:
+    """Queries of ``n_terms`` distinct terms drawn with the corpus term distribution."""
+    rng = np.random.default_rng(seed)
+    return [
+        " ".join(vocabulary[t] for t in rng.choice(len(vocabulary), size=n_terms, replace=False, p=probabilities))
+        for _ in range(n_queries)
+    ]
+
+
+def markdown_summaries(n_docs: int, mean_length: int = 600, seed: int = 0) -> list[tuple[str, str]]:
+    """(name, markdown) summaries shaped like the Gemini output: headed sections of
+    bullets with emphasis, links, inline code, quotes, snake_case identifiers and code fences."""
+    documents, _, _ = zipf_corpus(n_docs, mean_length=mean_length, seed=seed)
+    summaries = []
+    for name, text in documents:
+        words = text.split(" ")
+        sections = [" ".join(words[i:i + 100]) for i in range(0, len(words), 100)]
+        body = "\n\n".join(
+            f"## Section {i}\n- **{section[:20]}** {section}\n"
+            f"> _{words[i % len(words)]}_ uses {name}_{i} as *reported*\n"
+            f"1. see [link](https://example.org/{name}) `code`"
+            + (f"\n\n```\n{section[:40]}\n```" if i % 3 == 2 else "")
+            for i, section in enumerate(sections)
+        )
+        summaries.append((name, f"# {name}\n\n{body}\n"))
+    return summaries
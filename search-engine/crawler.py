@@ -1,58 +1,345 @@
 import argparse
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
 import glob
+import json
+import multiprocessing
+import os
+import pathlib as pl
 import re
-import pandas as pd
+import sys
+from typing import NamedTuple
 import asyncio
 import aiofiles
+import numpy as np
+import pyarrow as pa
+
+# The dataset format and the analyzer are shared with the search app
+sys.path.insert(0, str(pl.Path(__file__).resolve().parent / "app"))
+from dataset import (
+    Manifest, PartWriter, SourceFile, Vocabulary, compact, content_hash, read_dataset, read_duplicates,
+    read_vocabulary, write_duplicates, write_vocabulary,
+)
+from engine import ANALYZER, TokenizedDocument, analyze
+from metadata import year_of
+import minhash
+from pdf_store import PdfTextStore, paper_pdfs
+
+DEFAULT_DATASET = "index-dataset"
+
+SCHEMA = pa.schema([
+    ("name", pa.string()),
+    ("content", pa.string()),
+    ("deleted", pa.bool_()),
+    ("sections", pa.list_(pa.struct([("title", pa.string()), ("start", pa.int32())]))),
+])
+METADATA_SCHEMA = pa.schema([
+    *SCHEMA,
+    ("title", pa.string()),
+    ("authors", pa.list_(pa.string())),
+    ("journal", pa.string()),
+    ("year", pa.int64()),
+    ("doi", pa.string()),
+])
+# Written with --tokenize: the engine's analyzer output, as ids into the dataset vocabulary
+TOKEN_FIELDS = [
+    ("term_ids", pa.list_(pa.int32())),
+    ("term_freqs", pa.list_(pa.int32())),
+    ("token_terms", pa.list_(pa.int32())),
+    ("token_offsets", pa.list_(pa.int32())),
+    ("token_count", pa.int32()),
+]
+# Written with --dedup
+MINHASH_FIELD = ("minhash", pa.list_(pa.uint32()))
+
+# One alternation applied in a single re.sub. Every branch starts with a
+# literal character, so the regex engine skips straight to candidate
+# positions; line syntax is matched from the newline before it.
+MARKDOWN = re.compile(r"""
+    \n[ \t]*(?P<fence>`{3,}|~{3,}).*(?:\n(?![ \t]*(?P=fence)).*)*(?:\n.*)?               # fenced code: dropped
+  | \n[ \t]*(?:[-*_][ \t]*){3,}$                                                      # horizontal rule
+  | \n[ \t]*(?:>[ \t]*)*(?:(?P<heading>\#{1,6})(?:[ \t]+|$)|(?:[-*+]|\d+[.)])(?=\s))   # heading or list marker
+  | \n[ \t]*(?:>[ \t]*)+                                                              # quote marker
+  | `[^`\n]*`                                                                         # inline code: dropped
+  | !\[(?P<image>[^\]\n]*)\]\([^)\n]*\)                                               # image: its alt text
+  | \[(?P<link>[^\]\n]*)\]\([^)\n]*\)                                                 # link: its text
+  | \*(?<![\w*]\*)(?P<stars>\*{0,2})(?=\S)(?P<starred>.+?)(?<=\S)\*(?P=stars)(?![\w*])  # emphasis, but
+  | _(?<![\w*]_)(?P<unders>_?)(?=\S)(?P<underlined>.+?)(?<=\S)_(?P=unders)(?![\w*])    # not snake_case
+""", re.MULTILINE | re.VERBOSE)
+HEADING_MARK = "\0"
+
+
+class Section(NamedTuple):
+    title: str
+    start: int  # offset of the heading line in the extracted text
+
+
+def _replace_markdown(match: re.Match) -> str:
+    if match.group(0)[0] == "\n":
+        return "\n" + HEADING_MARK if match.group("heading") else "\n"
+    for text in ("link", "image"):
+        if match.group(text) is not None:
+            return match.group(text)
+    emphasised = match.group("starred") if match.group("starred") is not None else match.group("underlined")
+    if emphasised is not None:
+        return MARKDOWN.sub(_replace_markdown, emphasised)
+    return ""
+
+
+def extract_text(content: str) -> tuple[str, list[Section]]:
+    """Plain text and section boundaries of a markdown summary in one regex pass.
+
+    Fenced and inline code are dropped, links and images keep their text,
+    heading, list and quote markers and emphasis delimiters are removed,
+    and blank lines are skipped. Each heading starts a section.
+    """
+    text = MARKDOWN.sub(_replace_markdown, "\n" + content)
+    text = "\n".join(filter(None, map(str.strip, text.split("\n"))))
+    sections = []
+    if HEADING_MARK in text:
+        parts = text.split(HEADING_MARK)
+        text = "".join(parts)
+        offset = len(parts[0])
+        for part in parts[1:]:
+            sections.append(Section(part.split("\n", 1)[0], offset))
+            offset += len(part)
+    return text, sections
+
 
 def parse_markdown(content: str) -> str:
     """Clean and parse markdown content to extract plain text."""
-    
-    # Remove code blocks
-    content = re.sub(r'```[\s\S]*?```', '', content)
-    content = re.sub(r'`.*?`', '', content)
-    
-    # Extract text from links [text](url)
-    content = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', content)
-    
-    # Remove headers (#)
-    content = re.sub(r'#+\s*', '', content)
-    
-    # Remove bold/italic markers
-    content = re.sub(r'[*_]{1,2}(.*?)[*_]{1,2}', r'\1', content)
-    
-    # Clean bullet points and numbered lists
-    content = re.sub(r'^\s*[-*+]\s+', '', content, flags=re.MULTILINE)
-    content = re.sub(r'^\s*\d+\.\s+', '', content, flags=re.MULTILINE)
-    
-    # Remove empty lines and extra whitespace
-    content = '\n'.join(line.strip() for line in content.split('\n') if line.strip())
-    
-    return content
-
-async def get_markdown_text(path) -> str:
-    text = ""
-
-    async with aiofiles.open(path, 'r') as f:
-        text = await f.read()
-    
-    return text
-
-async def process_single_path(path):
+    return extract_text(content)[0]
+
+def append_pages(text: str, sections: list[Section], pages: list[str] | None) -> tuple[str, list[Section]]:
+    """Follow a summary's text with its PDF's page texts, each a "Page n" section."""
+    if not pages:
+        return text, sections
+    parts, sections, offset = [text] if text else [], list(sections), len(text)
+    for number, page in enumerate(pages, 1):
+        page = '\n'.join(line.strip() for line in page.split('\n') if line.strip())
+        if not page:
+            continue
+        offset += 1 if parts else 0  # the newline joining it on
+        sections.append(Section(f"Page {number}", offset))
+        parts.append(page)
+        offset += len(page)
+    return '\n'.join(parts), sections
+
+
+class ParsedBatch(NamedTuple):
+    parsed: list[tuple[str, list[Section]]]
+    tokenized: list[TokenizedDocument]  # term ids local to the batch: terms[i] is term i
+    terms: list[str]
+    signatures: list[np.ndarray | None]
+
+
+def parse_batch(documents: list[bytes], pages: list[list[str] | None] | None = None, tokenize: bool = False,
+                dedup: bool = False) -> ParsedBatch:
+    """Decode and parse a batch of summaries; runs in the parser processes.
+
+    ``pages`` holds the stored page texts of each summary's PDF, if any.
+    With ``tokenize`` the texts are also analyzed, and with ``dedup`` their
+    MinHash signatures computed; otherwise those lists are empty.
+    """
+    parsed = [extract_text(data.decode("utf-8")) for data in documents]
+    if pages:
+        parsed = [append_pages(text, sections, page_texts) for (text, sections), page_texts in zip(parsed, pages)]
+    texts = [text for text, _ in parsed]
+    term_ids: dict[str, int] = {}
+    tokenized = analyze(texts, term_ids) if tokenize else []
+    signatures = [minhash.signature(text) for text in texts] if dedup else []
+    return ParsedBatch(parsed, tokenized, list(term_ids), signatures)
+
+async def get_markdown_bytes(path) -> bytes:
+    async with aiofiles.open(path, 'rb') as f:
+        return await f.read()
+
+def paper_name(path: str) -> str:
     idx = path.rfind("/")
-    markdown_name = path[idx+1:].replace("summary_", "").replace(".md", "")
-    
-    content = await get_markdown_text(path)
-    cleaned_content = parse_markdown(content)
+    return path[idx+1:].replace("summary_", "").replace(".md", "")
+
+
+def original_pdf(summary_path: str) -> pl.Path | None:
+    """The paper PDF next to a summary, chosen as the catalog does."""
+    pdfs = sorted(pl.Path(summary_path).parent.glob("*.pdf"))
+    return next((pdf for pdf in pdfs if not pdf.name.startswith("summary_")), None)
+
+
+def stored_pages(pdf_store: PdfTextStore, summary_path: str) -> list[str] | None:
+    pdf = original_pdf(summary_path)
+    if pdf is None:
+        return None
+    try:
+        return pdf_store.page_texts(pdf_store.key(pdf))
+    except OSError as e:
+        print(f"Skipping the pages of {pdf}: {e}")
+        return None
+
+
+def scan_feed(feed_path, manifest: Manifest) -> tuple[list[tuple[str, str, os.stat_result]], list[str]]:
+    """Summaries that are new or whose size/mtime changed, and sources that are gone."""
+    candidates = []
+    sources = set()
+    for path in glob.iglob(f"{feed_path}/**/*.md", recursive=True):
+        source = os.path.relpath(path, feed_path)
+        sources.add(source)
+        stat = os.stat(path)
+        known = manifest.files.get(source)
+        if known is None or (known.size, known.mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            candidates.append((source, path, stat))
+    return candidates, sorted(set(manifest.files) - sources)
+
 
-    return (markdown_name, cleaned_content)
+async def read_worker(paths: asyncio.Queue, contents: asyncio.Queue) -> None:
+    while (item := await paths.get()) is not None:
+        source, path, stat = item
+        try:
+            data = await get_markdown_bytes(path)
+        except OSError as e:
+            print(f"Skipping {path}: {e}")
+            data = None
+        except Exception as e:
+            # The consumer waits for one item per file, so hand it the error to raise
+            await contents.put((source, path, stat, e))
+            return
+        await contents.put((source, path, stat, data))
 
 
-async def process_path(paths):
-    tasks = [process_single_path(path) for path in paths]
-    results = await asyncio.gather(*tasks)
+async def stream_changes(feed_path, manifest: Manifest, writer: PartWriter, metadata: dict | None = None,
+                         readers: int = 16, queue_size: int = 64, pool: Executor | None = None,
+                         batch_size: int = 64, max_pending: int = 8,
+                         vocabulary: dict[str, int] | None = None, dedup: bool = False,
+                         pdf_store: PdfTextStore | None = None) -> bool:
+    """Write rows for new, changed and removed summaries; updates the manifest in place.
 
-    return results
+    Files whose size and mtime match the manifest are not opened, and
+    files that were only touched (same content hash) are not parsed
+    again. At most ``readers`` files are open at once and at most
+    ``queue_size`` read files wait for parsing. Parsing runs on ``pool``
+    in batches of ``batch_size`` documents, with at most ``max_pending``
+    batches in flight; without a pool it runs inline. Given a
+    ``vocabulary``, texts are also tokenized and new terms are numbered
+    in it. With ``dedup`` each row gets the MinHash signature of its text.
+    With a ``pdf_store`` the page texts stored for each parsed summary's
+    PDF are appended to its text; PDFs themselves are never opened here.
+    Returns whether the manifest changed.
+    """
+    candidates, removed = scan_feed(feed_path, manifest)
+
+    # Deletions first, so a paper whose summary moved keeps its new row
+    for source in removed:
+        writer.write(paper_row(manifest.files.pop(source).name, "", True, metadata))
+
+    paths: asyncio.Queue = asyncio.Queue()
+    for candidate in candidates:
+        paths.put_nowait(candidate)
+    n_readers = min(readers, len(candidates))
+    for _ in range(n_readers):
+        paths.put_nowait(None)
+    contents: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    workers = [asyncio.create_task(read_worker(paths, contents)) for _ in range(n_readers)]
+
+    loop = asyncio.get_running_loop()
+    parse = partial(parse_batch, tokenize=vocabulary is not None, dedup=dedup)
+    batch: list[tuple[str, bytes, list[str] | None]] = []
+    pending: deque[tuple[list[str], asyncio.Future]] = deque()
+
+    def submit() -> None:
+        names, documents, pages = (list(column) for column in zip(*batch))
+        pages = pages if pdf_store is not None else None
+        batch.clear()
+        if pool is None:
+            future = loop.create_future()
+            future.set_result(parse(documents, pages))
+        else:
+            future = loop.run_in_executor(pool, parse, documents, pages)
+        pending.append((names, future))
+
+    async def drain(limit: int) -> None:
+        # Oldest batch first, so rows keep the order the files were read in
+        while len(pending) > limit:
+            names, future = pending.popleft()
+            parsed, tokenized, terms, signatures = await future
+            if tokenized:
+                # Batch-local term ids to dataset-wide ones
+                ids = np.fromiter((vocabulary.setdefault(term, len(vocabulary)) for term in terms),
+                                  dtype=np.int32, count=len(terms))
+                tokenized = [tokens._replace(term_ids=ids[tokens.term_ids], token_terms=ids[tokens.token_terms])
+                             for tokens in tokenized]
+            for name, (content, sections), tokens, signature in zip(
+                names, parsed, tokenized or [None] * len(names), signatures or [None] * len(names)
+            ):
+                writer.write(paper_row(name, content, False, metadata, sections, tokens, signature))
+
+    try:
+        for _ in range(len(candidates)):
+            source, path, stat, data = await contents.get()
+            if isinstance(data, Exception):
+                raise data
+            if data is None:
+                continue  # retried on the next run
+            digest = content_hash(data)
+            known = manifest.files.get(source)
+            name = paper_name(path)
+            manifest.files[source] = SourceFile(name, stat.st_size, stat.st_mtime_ns, digest)
+            if known is not None and known.sha256 == digest and known.name == name:
+                continue
+            # One lookup at a time (the store is not thread-safe), off the loop so the readers keep going
+            pages = await asyncio.to_thread(stored_pages, pdf_store, path) if pdf_store is not None else None
+            batch.append((name, data, pages))
+            if len(batch) >= batch_size:
+                submit()
+                await drain(max_pending)
+
+        if batch:
+            submit()
+        await drain(0)
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+    return bool(removed) or bool(candidates)
+
+
+def title_key(title: str) -> str:
+    """Join key tolerant of the filename sanitising done when papers are renamed."""
+    return " ".join(re.findall(r"[^\W_]+", title.casefold()))
+
+
+def load_metadata(metadata_path) -> dict[str, dict]:
+    with open(metadata_path, encoding="utf-8") as f:
+        articles = json.load(f)["articles"]
+    return {title_key(article["title"]): article for article in articles if article.get("title")}
+
+
+def article_fields(article: dict) -> dict:
+    return {
+        "title": article.get("title", ""),
+        "authors": list(article.get("authors", [])),
+        "journal": article.get("journal", ""),
+        "year": year_of(article.get("publication_date")),
+        "doi": article.get("doi", ""),
+    }
+
+
+def paper_row(name: str, content: str, deleted: bool, metadata: dict[str, dict] | None,
+              sections: list[Section] = (), tokens: TokenizedDocument | None = None,
+              signature: np.ndarray | None = None) -> dict:
+    row = {
+        "name": name,
+        "content": content,
+        "deleted": deleted,
+        "sections": [section._asdict() for section in sections],
+    }
+    if metadata is not None:
+        row.update(article_fields(metadata.get(title_key(name), {})))
+    if tokens is not None:
+        row.update(tokens._asdict(), token_count=len(tokens.token_terms))
+    if signature is not None:
+        row["minhash"] = signature
+    return row
 
 
 def parse_args():
@@ -60,23 +347,130 @@ def parse_args():
         description="A crawler script for store research content",
     )
     parser.add_argument("feed_path", help="Directory containing the help files")
+    parser.add_argument(
+        "--metadata",
+        help="sciencedirect_articles.json from beautiful-science-scrapper.py to join onto the papers",
+    )
+    parser.add_argument(
+        "--dataset", default=DEFAULT_DATASET,
+        help="Dataset directory: a manifest plus one parquet part per run with changes",
+    )
+    parser.add_argument("--csv", help="Also write the current papers to this CSV file")
+    parser.add_argument("--compact", action="store_true", help="Merge all parts into one afterwards")
+    parser.add_argument("--readers", type=int, default=16, help="Summaries read concurrently")
+    parser.add_argument("--row-group-size", type=int, default=1024, help="Papers per parquet row group")
+    parser.add_argument("--workers", type=int, help="Parser processes (default: one per core; 1 parses inline)")
+    parser.add_argument("--batch-size", type=int, default=64, help="Summaries sent to a parser process at once")
+    parser.add_argument(
+        "--tokenize", action="store_true",
+        help="Also store the search engine's tokens, so the server builds its index without tokenizing",
+    )
+    parser.add_argument(
+        "--dedup", action="store_true",
+        help="Store MinHash signatures and group near-duplicate papers under a canonical paper",
+    )
+    parser.add_argument("--dedup-threshold", type=float, default=0.5,
+                        help="Estimated word-shingle Jaccard similarity above which papers are duplicates")
+    parser.add_argument(
+        "--pdf-store",
+        help="PDF text store (see app/pdf_store.py) to fill from the feed's PDFs and append page texts from; "
+             "applies to summaries parsed in this run",
+    )
     return parser.parse_args()
 
 
-async def async_main(feed_path):
-    markdown_paths = glob.glob(f"{feed_path}/**/*.md", recursive=True)
+def group_duplicates(dataset, threshold: float) -> int:
+    """Regroup near-duplicates across all live papers from their stored signatures.
+
+    Papers crawled without --dedup have no signature and stay on their
+    own. Returns the number of papers that are a duplicate of another.
+    """
+    data = read_dataset(dataset, columns=["minhash"])
+    signed = data[data["minhash"].notna()] if "minhash" in data.columns else data.iloc[:0]
+    canonical = {}
+    if len(signed) > 1:
+        signatures = np.stack(signed["minhash"].values).astype(np.uint32)
+        canonical = minhash.duplicate_groups(list(signed["name"]), signatures, threshold)
+    write_duplicates(dataset, canonical)
+    return len(canonical)
+
+
+def parser_pool(workers: int):
+    # spawn: forking a process that already runs aiofiles' reader threads is unsafe
+    if workers <= 1:
+        return nullcontext()
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+async def async_main(feed_path, metadata_path=None, dataset=DEFAULT_DATASET, csv_path=None, compact_parts=False,
+                     readers=16, row_group_size=1024, workers=None, batch_size=64, tokenize=False,
+                     dedup=False, dedup_threshold=0.5, pdf_store=None):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    store = None
+    if pdf_store:
+        # Before any reader starts: nothing else runs on the loop yet, and the
+        # extraction processes are forked from a single-threaded process
+        store = PdfTextStore(pdf_store)
+        extracted = store.extract(paper_pdfs(feed_path), workers)
+        print(f"Extracted {extracted} new or changed PDFs into {pdf_store}")
+    manifest = Manifest(dataset)
+    metadata = load_metadata(metadata_path) if metadata_path else None
+    schema = METADATA_SCHEMA if metadata is not None else SCHEMA
+    vocabulary = None
+    if tokenize:
+        schema = pa.schema([*schema, *TOKEN_FIELDS])
+        stored = read_vocabulary(dataset) or Vocabulary(ANALYZER, [])
+        if stored.analyzer != ANALYZER:
+            raise ValueError(f"{dataset} was tokenized by a different analyzer; crawl into a new dataset")
+        vocabulary = {term: term_id for term_id, term in enumerate(stored.terms)}
+    if dedup:
+        schema = pa.schema([*schema, MINHASH_FIELD])
+    writer = PartWriter(manifest, schema, row_group_size)
+    try:
+        with parser_pool(workers) as pool:
+            manifest_changed = await stream_changes(
+                feed_path, manifest, writer, metadata, readers,
+                pool=pool, batch_size=batch_size, max_pending=2 * workers, vocabulary=vocabulary, dedup=dedup,
+                pdf_store=store,
+            )
+        if tokenize and len(vocabulary) > len(stored.terms):
+            # Before the part that uses the new ids is committed
+            write_vocabulary(dataset, Vocabulary(ANALYZER, list(vocabulary)))
+        part = writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+
+    if part:
+        print(f"Saved {writer.rows_written} new, changed or removed papers to {dataset}/{part}")
+    else:
+        if manifest_changed:
+            manifest.save()
+        print("No new, changed or removed papers")
 
-    results = await process_path(markdown_paths)
+    # Once grouped, groups are kept current, since any change can join or split them
+    if manifest.parts and (dedup or read_duplicates(dataset) is not None):
+        duplicates = group_duplicates(dataset, dedup_threshold)
+        print(f"{duplicates} papers are near-duplicates of another paper")
 
-    df = pd.DataFrame(results, columns=['name', 'content'])
-    df.to_parquet("index.parquet", index=False)
-    print("Saved to output parquet file")
-    df.to_csv("index.csv", index=False)
-    print("Saved to output CSV file")
+    if compact_parts and compact(dataset, schema, row_group_size):
+        print(f"Compacted {dataset} into a single part")
+    if csv_path:
+        stored_only = [name for name, _ in [*TOKEN_FIELDS, MINHASH_FIELD]]
+        papers = read_dataset(dataset).drop(columns=stored_only, errors="ignore")
+        papers.to_csv(csv_path, index=False)
+        print("Saved to output CSV file")
 
-def main(feed_path):
-    asyncio.run(async_main(feed_path))
+def main(feed_path, metadata_path=None, dataset=DEFAULT_DATASET, csv_path=None, compact_parts=False,
+         readers=16, row_group_size=1024, workers=None, batch_size=64, tokenize=False, dedup=False,
+         dedup_threshold=0.5, pdf_store=None):
+    asyncio.run(async_main(
+        feed_path, metadata_path, dataset, csv_path, compact_parts, readers, row_group_size, workers, batch_size,
+        tokenize, dedup, dedup_threshold, pdf_store,
+    ))
 
 if __name__ == "__main__":
     args = parse_args()
-    main(args.feed_path)
+    main(args.feed_path, args.metadata, args.dataset, args.csv, args.compact, args.readers, args.row_group_size,
+         args.workers, args.batch_size, args.tokenize, args.dedup, args.dedup_threshold, args.pdf_store)
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# Exercise the engine the app actually serves, and the crawler beside it.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+sys.path.insert(1, str(Path(__file__).resolve().parents[1]))
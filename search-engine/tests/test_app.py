@@ -0,0 +1,34 @@
+import asyncio
+import json
+from urllib.parse import quote
+
+from fastapi.testclient import TestClient
+
+import app
+from corpora import Corpus, CorpusRegistry
+from crawler import async_main
+
+
+def test_results_accept_filter_values_with_slashes(tmp_path, monkeypatch):
+    feed, dataset = tmp_path / "feed", tmp_path / "dataset"
+    for name, doi in [("alpha", "10.1000/xyz"), ("beta", "10.1000/abc")]:
+        folder = feed / name
+        folder.mkdir(parents=True)
+        (folder / f"summary_{name}.md").write_text("biomass cookstove trial")
+        (folder / f"summary_{name}.pdf").write_bytes(b"%PDF")
+        (folder / f"{name}.pdf").write_bytes(b"%PDF")
+    metadata = tmp_path / "articles.json"
+    metadata.write_text(json.dumps({"articles": [
+        {"title": "alpha", "journal": "Energy", "publication_date": "2019", "doi": "10.1000/xyz"},
+        {"title": "beta", "journal": "Energy", "publication_date": "2020", "doi": "10.1000/abc"},
+    ]}))
+    asyncio.run(async_main(str(feed), str(metadata), str(dataset), workers=1))
+
+    registry = CorpusRegistry()
+    registry.register(Corpus("default", app.load_engine, dataset, feed))
+    monkeypatch.setattr(app, "registry", registry)
+    with TestClient(app.app) as client:
+        for path in ("/results/cookstove doi:10.1000/xyz", f"/results/{quote('cookstove doi:10.1000/xyz', safe='')}"):
+            response = client.get(path)
+            assert response.status_code == 200
+            assert "/papers/alpha/" in response.text and "/papers/beta/" not in response.text
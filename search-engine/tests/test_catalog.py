@@ -0,0 +1,34 @@
+import os
+
+from catalog import PaperCatalog
+
+
+def make_paper(root, name):
+    folder = root / name
+    folder.mkdir()
+    for filename in (f"{name}.pdf", f"summary_{name}.md", f"summary_{name}.pdf"):
+        (folder / filename).write_text("x")
+    return folder
+
+
+def test_catalog_tracks_added_and_removed_papers(tmp_path):
+    make_paper(tmp_path, "alpha")
+    catalog = PaperCatalog(tmp_path)
+
+    assert catalog.refresh()
+    assert catalog.get("alpha")["pdf"].name == "alpha.pdf"
+    assert not catalog.refresh()
+    version = catalog.version
+
+    beta = make_paper(tmp_path, "beta")
+    os.utime(beta, ns=(1, 1))
+    assert catalog.refresh()
+    assert catalog.get("beta")["summary_md"].name == "summary_beta.md"
+
+    for path in beta.iterdir():
+        path.unlink()
+    beta.rmdir()
+    assert catalog.refresh()
+    assert catalog.get("beta") is None
+    assert catalog.version == version + 2
+
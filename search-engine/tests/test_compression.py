@@ -0,0 +1,82 @@
+import asyncio
+import gzip
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from compression import CompressionMiddleware, choose_encoding
+
+TEXT = "biomass cookstove smoke " * 100
+
+
+def client_for(endpoint):
+    app = Starlette(routes=[Route("/", endpoint)])
+    app.add_middleware(CompressionMiddleware)
+    return TestClient(app)
+
+
+def test_choose_encoding_honours_q_values():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("identity") is None
+
+
+def test_text_is_compressed_and_loses_byte_validators():
+    client = client_for(lambda request: PlainTextResponse(
+        TEXT, headers={"etag": '"abc"', "accept-ranges": "bytes"}
+    ))
+    response = client.get("/", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert response.headers["etag"] == 'W/"abc"'
+    assert "accept-ranges" not in response.headers
+    assert int(response.headers["content-length"]) < len(TEXT)
+    assert response.text == TEXT
+
+    identity = client.get("/", headers={"accept-encoding": "identity"})
+    assert "content-encoding" not in identity.headers and identity.headers["etag"] == '"abc"'
+
+
+def test_small_binary_and_encoded_bodies_pass_through():
+    encoded = gzip.compress(TEXT.encode())
+    for response, encoding in (
+        (PlainTextResponse("short"), None),
+        (Response(TEXT.encode(), media_type="application/pdf"), None),
+        (Response(encoded, media_type="text/plain", headers={"content-encoding": "gzip"}), "gzip"),
+    ):
+        client = client_for(lambda request, response=response: response)
+        result = client.get("/", headers={"accept-encoding": "gzip"})
+        assert result.headers.get("content-encoding") == encoding
+        assert result.headers["content-length"] == str(len(response.body))
+
+
+def test_streamed_text_is_compressed_chunk_by_chunk():
+    async def chunks():
+        for _ in range(3):
+            yield TEXT
+
+    client = client_for(lambda request: StreamingResponse(chunks(), media_type="text/plain"))
+    response = client.get("/", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip" and "content-length" not in response.headers
+    assert response.text == TEXT * 3
+
+
+def test_path_sent_files_keep_their_start_message():
+    start = {"type": "http.response.start", "status": 200,
+             "headers": [(b"content-type", b"text/markdown"), (b"content-length", b"2400")]}
+    pathsend = {"type": "http.response.pathsend", "path": "/papers/a/summary_a.md"}
+
+    async def app(scope, receive, send):
+        await send(start)
+        await send(pathsend)
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(app)(scope, None, send))
+    assert sent == [start, pathsend]
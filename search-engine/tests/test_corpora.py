@@ -0,0 +1,26 @@
+import asyncio
+
+from corpora import Corpus, CorpusRegistry
+from engine import SearchEngine
+
+
+def loader(path):
+    engine = SearchEngine()
+    engine.bulk_index([(path.stem, "biomass cookstove smoke")])
+    return engine
+
+
+def test_registry_loads_lazily_and_evicts_least_recently_used(tmp_path):
+    registry = CorpusRegistry(memory_budget=1)
+    for name in ("alpha", "beta"):
+        registry.register(Corpus(name, loader, tmp_path / f"{name}.parquet", tmp_path))
+
+    async def scenario():
+        alpha = await registry.get()
+        assert alpha.loaded and alpha.indexes.current.engine.papers == ["alpha"]
+        beta = await registry.get("beta")
+        assert beta.loaded and not alpha.loaded  # alpha evicted to fit the budget
+        assert (await registry.get("alpha")).loaded and not beta.loaded
+        registry.shutdown()
+
+    asyncio.run(scenario())
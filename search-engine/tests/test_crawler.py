@@ -0,0 +1,158 @@
+import asyncio
+import json
+import os
+
+import pyarrow.parquet as pq
+import pytest
+
+import crawler
+from app import load_engine
+from crawler import Section, async_main, extract_text
+from dataset import Manifest, compact, read_dataset
+from engine import SearchEngine
+
+
+def write_summary(feed, name, text, mtime_ns=None):
+    path = feed / name / f"summary_{name}.md"
+    path.parent.mkdir(exist_ok=True)
+    path.write_text(text)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+def crawl(feed, dataset):
+    asyncio.run(async_main(str(feed), dataset=str(dataset)))
+    return read_dataset(dataset)
+
+
+def test_incremental_crawl_appends_changes_and_deletions(tmp_path):
+    feed, dataset = tmp_path / "feed", tmp_path / "dataset"
+    feed.mkdir()
+    write_summary(feed, "alpha", "# Alpha\nbiomass cookstove")
+    beta = write_summary(feed, "beta", "solar **cooker**")
+
+    data = crawl(feed, dataset)
+    assert dict(zip(data["name"], data["content"])) == {"alpha": "Alpha\nbiomass cookstove", "beta": "solar cooker"}
+
+    # Unchanged files add no part; touched-but-identical files are not reparsed
+    crawl(feed, dataset)
+    os.utime(beta, ns=(1, 1))
+    crawl(feed, dataset)
+    assert len(Manifest(dataset).parts) == 1
+
+    write_summary(feed, "beta", "solar oven", mtime_ns=2)
+    write_summary(feed, "gamma", "improved stove")
+    (feed / "alpha" / "summary_alpha.md").unlink()
+    data = crawl(feed, dataset)
+    assert dict(zip(data["name"], data["content"])) == {"beta": "solar oven", "gamma": "improved stove"}
+    assert len(Manifest(dataset).parts) == 2
+
+    compact(dataset)
+    assert Manifest(dataset).parts == ["part-00003.parquet"]
+    assert sorted(read_dataset(dataset)["name"]) == ["beta", "gamma"]
+    assert sorted(p.name for p in dataset.glob("*.parquet")) == ["part-00003.parquet"]
+
+
+def test_read_errors_fail_the_crawl_instead_of_hanging(tmp_path, monkeypatch):
+    feed, dataset = tmp_path / "feed", tmp_path / "dataset"
+    feed.mkdir()
+    for i in range(5):
+        write_summary(feed, f"paper{i}", f"stove {i}")
+    read = crawler.get_markdown_bytes
+
+    async def get_markdown_bytes(path):
+        if "paper3" in str(path):
+            raise ValueError("not markdown")
+        return await read(path)
+
+    monkeypatch.setattr(crawler, "get_markdown_bytes", get_markdown_bytes)
+
+    async def run():
+        await asyncio.wait_for(async_main(str(feed), dataset=str(dataset), readers=2), timeout=10)
+
+    with pytest.raises(ValueError, match="not markdown"):
+        asyncio.run(run())
+    assert Manifest(dataset).parts == []
+
+
+def test_pipeline_writes_fixed_size_row_groups(tmp_path):
+    feed, dataset = tmp_path / "feed", tmp_path / "dataset"
+    feed.mkdir()
+    for i in range(25):
+        write_summary(feed, f"paper{i:02d}", f"stove {i}")
+    metadata = tmp_path / "articles.json"
+    metadata.write_text(json.dumps({"articles": [
+        {"title": "paper03", "authors": ["Kim"], "journal": "Energy", "publication_date": "2019"}
+    ]}))
+
+    asyncio.run(async_main(str(feed), str(metadata), str(dataset), readers=3, row_group_size=10,
+                           workers=2, batch_size=4))
+
+    part = pq.ParquetFile(dataset / Manifest(dataset).parts[0])
+    assert [part.metadata.row_group(i).num_rows for i in range(part.num_row_groups)] == [10, 10, 5]
+    data = read_dataset(dataset).set_index("name")
+    assert len(data) == 25 and data.loc["paper07", "content"] == "stove 7"
+    assert list(data.loc["paper03", "authors"]) == ["Kim"] and data.loc["paper03", "year"] == 2019
+
+    # Compacted parts keep the crawl's schema and row groups
+    schema = part.schema_arrow
+    write_summary(feed, "paper00", "# Intro\nstove 0", mtime_ns=1)
+    asyncio.run(async_main(str(feed), str(metadata), str(dataset), compact_parts=True, row_group_size=10))
+    part = pq.ParquetFile(dataset / Manifest(dataset).parts[0])
+    assert len(Manifest(dataset).parts) == 1 and part.schema_arrow == schema
+    assert part.schema_arrow.metadata is None
+    assert [part.metadata.row_group(i).num_rows for i in range(part.num_row_groups)] == [10, 10, 5]
+    assert list(read_dataset(dataset).set_index("name").loc["paper00", "sections"]) == [{"title": "Intro", "start": 0}]
+
+
+def test_extract_text_keeps_identifiers_and_marks_sections():
+    text, sections = extract_text(
+        "# Stove *trials*\n> uses `x` and **fuel_type** data_set_v2\n"
+        "```\ncode_block()\n```\n---\n## Results\n- see [table](t.md) ![fig](f.png)\n"
+    )
+    assert text == "Stove trials\nuses  and fuel_type data_set_v2\nResults\nsee table fig"
+    assert sections == [Section("Stove trials", 0), Section("Results", text.index("Results"))]
+
+
+def test_tokenized_crawl_builds_the_same_index(tmp_path):
+    feed, dataset = tmp_path / "feed", tmp_path / "dataset"
+    feed.mkdir()
+    for i in range(10):
+        write_summary(feed, f"paper{i}", f"# Stove {i}\nImproved *biomass* stoves, trial {i % 3}.")
+    asyncio.run(async_main(str(feed), dataset=str(dataset), workers=2, batch_size=3, tokenize=True))
+    # A later run numbers only its new terms; an untokenized run is tokenized on load
+    write_summary(feed, "paper10", "solar cooker trial")
+    asyncio.run(async_main(str(feed), dataset=str(dataset), workers=1, tokenize=True))
+    write_summary(feed, "paper11", "charcoal stove")
+    asyncio.run(async_main(str(feed), dataset=str(dataset), workers=1))
+
+    engine = load_engine(dataset, related_k=0)
+    expected = SearchEngine()
+    expected.bulk_index(list(zip(*(read_dataset(dataset)[column] for column in ("name", "content")))))
+    assert {t: dict(p) for t, p in engine._index.items()} == {t: dict(p) for t, p in expected._index.items()}
+    assert engine.search("stove trial 2") == expected.search("stove trial 2")
+    assert engine.snippet("paper4", "biomass") == expected.snippet("paper4", "biomass")
+
+
+def test_dedup_groups_near_duplicates_and_engine_collapses_them(tmp_path):
+    feed, dataset = tmp_path / "feed", tmp_path / "dataset"
+    feed.mkdir()
+    text = " ".join(f"word{i}" for i in range(200))
+    write_summary(feed, "preprint", f"# Stove trial\n{text} biomass")
+    write_summary(feed, "published", f"# Stove trial\n{text} biomass stoves")
+    write_summary(feed, "other", "solar cooker biomass")
+    asyncio.run(async_main(str(feed), dataset=str(dataset), workers=1, dedup=True))
+    assert read_dataset(dataset).set_index("name")["canonical"].to_dict() == {
+        "preprint": "preprint", "published": "preprint", "other": "other"
+    }
+
+    engine = load_engine(dataset, related_k=0)
+    # The shorter preprint scores higher, so it is the copy kept
+    assert set(engine.collapse_duplicates(engine.search("biomass"))) == {"other", "preprint"}
+    assert engine.duplicates_of("published") == ["preprint"]
+
+    # Groups follow changes: the preprint is gone, so the published copy stands alone
+    (feed / "preprint" / "summary_preprint.md").unlink()
+    asyncio.run(async_main(str(feed), dataset=str(dataset), workers=1, dedup=True))
+    assert set(read_dataset(dataset)["canonical"]) == {"published", "other"}
@@ -1,4 +1,9 @@
+import numpy as np
+import pytest
+
 from engine import SearchEngine
+from metadata import parse_filters
+from vectors import top_neighbours
 
 
 def test_search_engine():
@@ -11,5 +16,171 @@ def test_search_engine():
     assert len(engine.search("bar")) == 1
 
 
+def test_snippet_highlights_query_terms():
+    engine = SearchEngine()
+    filler = " ".join(f"word{i}" for i in range(200))
+    text = f"{filler} Improved cookstoves reduce indoor smoke. {filler}"
+    engine.bulk_index([("paper", text)])
+
+    segments = engine.snippet("paper", "cookstoves smoke", window=10)
+    highlighted = [text for text, hit in segments if hit]
+
+    assert highlighted == ["cookstoves", "smoke"]
+    assert segments[0] == ("… ", False)
+    assert segments[-1] == (" …", False)
+    assert engine.snippet("missing", "smoke") == []
+
+
+def test_hybrid_search_finds_related_vocabulary():
+    engine = SearchEngine()
+    docs = [
+        ("a", "cookstove biomass stove emissions"),
+        ("b", "cookstove biomass stove efficiency"),
+        ("c", "biomass stove field trial"),
+        ("d", "solar panel grid storage"),
+        ("e", "solar panel battery storage"),
+        ("f", "grid battery inverter"),
+    ]
+    engine.bulk_index(docs)
+    assert engine.hybrid_search("cookstove") == engine.search("cookstove")
+
+    engine.build_dense(dim=2, n_lists=2)
+    results = engine.hybrid_search("cookstove")
+
+    assert {"a", "b"} <= set(results)
+    assert "c" in results
+    assert "d" not in results
+    assert "c" in engine.dense_search("cookstove")
+    assert engine.hybrid_search("cookstove", alpha=1.0).keys() == engine.search("cookstove").keys()
+
+
+def test_hybrid_search_scores_only_the_top_postings_of_common_terms():
+    engine = SearchEngine()
+    # Equal lengths, so BM25 orders the papers by their count of "stove"
+    engine.bulk_index([(f"p{i}", "stove " * i + "kilns " * (6 - i)) for i in range(1, 7)])
+    engine.build_dense(dim=2, n_lists=2, impact_depth=2)
+    exact = engine.search("stove")
+    assert len(exact) == 6
+
+    # No dense hits pass min_similarity, leaving the lexical top k
+    results = engine.hybrid_search("stove", k=2, min_similarity=2.0)
+
+    assert results == pytest.approx({"p6": 0.5, "p5": 0.5 * exact["p5"] / exact["p6"]})
+
+
+def test_related_uses_precomputed_neighbours():
+    engine = SearchEngine()
+    engine.bulk_index([
+        ("a", "biomass cookstove smoke"),
+        ("b", "biomass cookstove emissions"),
+        ("c", "solar panel"),
+    ])
+    assert engine.related("a") is None
+
+    engine.build_related(k=2)
+
+    assert list(engine.related("a")) == ["b"]
+    assert engine.related("c") == {}
+    assert engine.related("missing") is None
+
+
+def test_pruned_neighbours_rescore_candidates_exactly():
+    engine = SearchEngine()
+    engine.bulk_index([
+        ("a", "stove smoke biomass"),
+        ("b", "stove smoke biomass kiln"),
+        ("c", "stove solar"),
+        ("d", "stove solar panel"),
+        ("e", "stove"),
+    ])
+    weighted, _, _ = engine._weighted_terms()
+    exact_ids, exact_scores = top_neighbours(weighted, k=2, max_df=1.0)
+    # "stove" is in every row: it never makes a pair but still counts in the scores
+    ids, scores = top_neighbours(weighted, k=2, max_df=0.5, min_df_cap=1)
+
+    assert ids[:4, 0].tolist() == exact_ids[:4, 0].tolist() == [1, 0, 3, 2]
+    assert np.allclose(scores[:4, 0], exact_scores[:4, 0])
+    assert (ids[:4, 1] == -1).all() and ids[4].tolist() == [-1, -1]
+    assert exact_ids[4, 0] >= 0
+
+
+def test_cluster_counts_group_matching_documents():
+    engine = SearchEngine()
+    engine.bulk_index([
+        ("a", "biomass cookstove smoke emissions"),
+        ("b", "biomass cookstove smoke exposure"),
+        ("c", "solar panel battery study"),
+        ("d", "solar panel inverter study"),
+    ])
+    assert engine.cluster_counts(["a"]) == []
+
+    engine.build_clusters(n_clusters=2, dim=2)
+
+    assert engine.cluster_of("a") == engine.cluster_of("b")
+    assert engine.cluster_of("a") != engine.cluster_of("c")
+    counts = engine.cluster_counts(engine.search("study cookstove"))
+    assert sorted(count for _, _, count in counts) == [2, 2]
+
+
+def test_metadata_filters_restrict_scoring():
+    engine = SearchEngine()
+    engine.bulk_index([("old", "cookstove trial"), ("new", "cookstove survey"), ("bare", "cookstove")])
+    engine.index_metadata({
+        "old": {"journal": "Energy Policy", "year": 2012, "authors": ["A. Smith"]},
+        "new": {"journal": "Energy for Sustainable Development", "year": 2019, "authors": ["B. Jones"], "doi": "10.1000/ABC"},
+    })
+
+    text, filters = parse_filters('cookstove year>=2018 journal:"energy for sustainable development"')
+    assert text == "cookstove"
+    assert list(engine.search(text, filters)) == ["new"]
+    # Fewer postings than allowed papers, and the other way round
+    assert list(engine.search("survey trial", filters)) == ["new"]
+    _, filters = parse_filters("doi:10.1000/abc")
+    assert list(engine.search("cookstove", filters)) == ["new"]
+
+    _, filters = parse_filters("author:smith")
+    assert engine.search("", filters) == {"old": 0.0}
+    assert engine.facets(engine.search("cookstove"))["year"] == [("2012", 1), ("2019", 1)]
+
+
+def test_snapshot_round_trip(tmp_path):
+    engine = SearchEngine()
+    engine.bulk_index([("foo", "foo content"), ("bar", "bar content")])
+    engine.build_related(k=1)
+    path = tmp_path / "index.snapshot"
+
+    engine.save_snapshot(path)
+    loaded = SearchEngine.load_snapshot(path)
+
+    assert loaded.search("content") == engine.search("content")
+    assert loaded.related("foo") == engine.related("foo")
+    loaded.bulk_index([("baz", "baz content")])
+    assert len(loaded.search("content")) == 3
+
+
+def test_stats_report_postings_distribution():
+    engine = SearchEngine()
+    engine.bulk_index([("a", "smoke smoke stove"), ("b", "smoke fuel"), ("c", "smoke")])
+    engine.search("unknownterm")
+
+    stats = engine.stats(top_n=1)
+    assert stats["vocabulary_size"] == 3  # queries do not add terms
+    assert stats["total_postings"] == 5
+    assert stats["postings_length_histogram"] == [
+        {"min": 1, "max": 1, "terms": 2},
+        {"min": 2, "max": 3, "terms": 1},
+    ]
+    assert stats["heaviest_terms"] == [{"term": "smoke", "documents": 3, "occurrences": 4}]
+    assert stats["total_bytes"] == engine.approximate_nbytes() > 0
+    assert "index" in stats["build_seconds"]
+
+
 if __name__ == "__main__":
     test_search_engine()
+    test_snippet_highlights_query_terms()
+    test_hybrid_search_finds_related_vocabulary()
+    test_hybrid_search_scores_only_the_top_postings_of_common_terms()
+    test_related_uses_precomputed_neighbours()
+    test_cluster_counts_group_matching_documents()
+    test_metadata_filters_restrict_scoring()
+    test_stats_report_postings_distribution()
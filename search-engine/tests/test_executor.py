@@ -0,0 +1,44 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+import app
+from executor import BudgetExceeded, Overloaded, SearchExecutor
+
+
+def test_full_executor_rejects_and_slow_searches_keep_their_slot(monkeypatch):
+    executor = SearchExecutor(workers=1, queue_size=1, timeout=0.05)
+    monkeypatch.setattr(app, "search_executor", executor)
+    release = threading.Event()
+
+    async def scenario():
+        # One search running, one queued: the pool is full
+        running = [asyncio.create_task(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        assert (executor.in_flight, executor.queue_depth) == (2, 1)
+
+        with pytest.raises(Overloaded):
+            await executor.run(lambda: "never runs")
+        with pytest.raises(HTTPException) as rejected:
+            await app.execute_search(lambda: "never runs")
+        assert rejected.value.status_code == 503 and rejected.value.headers == {"Retry-After": "1"}
+
+        # Both callers give up after the budget, but the worker is still busy
+        for task in running:
+            with pytest.raises(BudgetExceeded):
+                await task
+        assert executor.in_flight == 2
+
+        release.set()
+        while executor.in_flight:
+            await asyncio.sleep(0.01)
+        assert await executor.run(lambda: "ok") == "ok"
+
+        with pytest.raises(HTTPException) as timed_out:
+            await app.execute_search(threading.Event().wait, 0.2)
+        assert timed_out.value.status_code == 503 and timed_out.value.detail == "Search took too long"
+
+    asyncio.run(scenario())
+    executor.shutdown()
@@ -0,0 +1,21 @@
+from metrics import Counter, Histogram
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("stage_seconds", "Stage time.", "stage", ("parse", "score"), buckets=(0.01, 0.1))
+    for seconds in (0.005, 0.05, 0.5):
+        histogram.observe("score", seconds)
+
+    lines = histogram.render()
+    assert 'stage_seconds_bucket{stage="score",le="0.01"} 1' in lines
+    assert 'stage_seconds_bucket{stage="score",le="0.1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="score",le="+Inf"} 3' in lines
+    assert 'stage_seconds_count{stage="parse"} 0' in lines
+
+
+def test_counter_labels():
+    counter = Counter("requests_total", "Requests.", ("endpoint", "status"))
+    counter.inc("search", 200)
+    counter.inc("search", 200)
+    assert counter.value("search", 200) == 2
+    assert 'requests_total{endpoint="search",status="200"} 2' in counter.render()
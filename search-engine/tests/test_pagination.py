@@ -0,0 +1,19 @@
+import pagination
+
+
+def test_cursor_pages_cover_results_in_rank_order():
+    scores = {f"doc{i}": float(i % 4) for i in range(10)}
+    expected = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    pages, cursor = [], None
+    while True:
+        items, cursor = pagination.page(scores, 3, cursor)
+        pages.extend(items)
+        if cursor is None:
+            break
+
+    assert pages == expected
+    assert list(pagination.stream(scores)) == expected
+
+    _, cursor = pagination.page(scores, 4)
+    assert list(pagination.stream(scores, cursor)) == expected[4:]
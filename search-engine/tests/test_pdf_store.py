@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from crawler import async_main
+from dataset import Manifest, read_dataset
+from pdf_store import PdfTextStore, guess_title
+
+fitz = pytest.importorskip("fitz")
+
+
+def write_summary(feed, name, text):
+    path = feed / name / f"summary_{name}.md"
+    path.parent.mkdir(exist_ok=True)
+    path.write_text(text)
+    return path
+
+
+def test_pdf_store_extracts_once_and_crawler_appends_pages(tmp_path):
+    feed, dataset, store_dir = tmp_path / "feed", tmp_path / "dataset", tmp_path / "pdf-text"
+    feed.mkdir()
+    write_summary(feed, "alpha", "# Alpha\nbiomass cookstove")
+    pdf = fitz.open()
+    for number, text in enumerate(["clay stove efficiency", "smoke emissions"]):
+        page = pdf.new_page()
+        if number == 0:
+            page.insert_text((72, 60), "Clay Stoves", fontsize=20)
+        page.insert_text((72, 100), text, fontsize=10)
+    pdf.save(feed / "alpha" / "paper.pdf")
+
+    asyncio.run(async_main(str(feed), dataset=str(dataset), workers=1, pdf_store=str(store_dir)))
+    data = read_dataset(dataset)
+    content = "Alpha\nbiomass cookstove\nClay Stoves\nclay stove efficiency\nsmoke emissions"
+    assert data["content"].tolist() == [content]
+    assert [tuple(s.values()) for s in data["sections"][0]] == [
+        ("Alpha", 0), ("Page 1", content.index("Clay")), ("Page 2", content.index("smoke"))
+    ]
+
+    # Renamed copies are the same content: nothing is parsed again
+    store = PdfTextStore(store_dir)
+    (feed / "alpha" / "paper.pdf").rename(feed / "alpha" / "renamed.pdf")
+    assert store.extract([feed / "alpha" / "renamed.pdf"], workers=1) == 0
+    assert guess_title(store.get(feed / "alpha" / "renamed.pdf")) == "Clay Stoves"
+
+    # A batch is one part however many PDFs it holds
+    for i in range(5):
+        copy = fitz.open(feed / "alpha" / "renamed.pdf")
+        copy.set_metadata({"title": f"copy {i}"})
+        copy.save(tmp_path / f"copy{i}.pdf")
+    assert store.extract([tmp_path / f"copy{i}.pdf" for i in range(5)], workers=2) == 5
+    assert len(Manifest(store_dir).parts) == 2
+    assert store.read(store.key(tmp_path / "copy3.pdf"), ["title"]) == {"title": "copy 3"}
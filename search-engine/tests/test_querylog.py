@@ -0,0 +1,15 @@
+from querylog import QueryLog, most_frequent, read_queries
+
+
+def test_query_log_rotates_and_reads_oldest_first(tmp_path):
+    path = tmp_path / "queries.log"
+    log = QueryLog(path, max_bytes=200, backups=5)
+    for i in range(12):
+        log.record("default", "api", f"query {i % 3}\twith tab", 0.0015)
+    log.close()
+
+    assert (tmp_path / "queries.log.1").exists()
+    queries = list(read_queries(path))
+    assert [q.query for q in queries] == [f"query {i % 3} with tab" for i in range(12)]
+    assert queries[0].latency_ms == 1.5 and queries[0].endpoint == "api"
+    assert most_frequent(path, 1) == [("default", "query 0 with tab")]
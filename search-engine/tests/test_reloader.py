@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+from app import load_engine
+from crawler import async_main
+from reloader import IndexReloader
+
+
+def test_rewritten_dataset_is_swapped_in_while_searches_continue(tmp_path):
+    feed, dataset = tmp_path / "feed", tmp_path / "dataset"
+    for name, text in [("alpha", "biomass cookstove"), ("beta", "solar cooker")]:
+        (feed / name).mkdir(parents=True)
+        (feed / name / f"summary_{name}.md").write_text(text)
+
+    def slow_loader(path):
+        time.sleep(0.2)  # a reload long enough for searches to overlap it
+        return load_engine(path)
+
+    async def scenario():
+        await async_main(str(feed), dataset=str(dataset), workers=1)
+        reloader = IndexReloader(slow_loader, dataset, interval=0.02)
+        await asyncio.to_thread(reloader.load)
+        assert reloader.current.generation == 1
+        watcher = asyncio.create_task(reloader.watch())
+
+        (feed / "gamma").mkdir()
+        (feed / "gamma" / "summary_gamma.md").write_text("improved cookstove")
+        await async_main(str(feed), dataset=str(dataset), workers=1)
+
+        searched_while_reloading = False
+        deadline = time.monotonic() + 10
+        while reloader.current.generation == 1 and time.monotonic() < deadline:
+            index = reloader.current
+            assert "alpha" in index.engine.search("cookstove")
+            searched_while_reloading |= reloader.reloading
+            await asyncio.sleep(0.01)
+        watcher.cancel()
+
+        assert searched_while_reloading
+        assert reloader.current.generation == 2 and reloader.last_error is None
+        assert set(reloader.current.engine.search("cookstove")) == {"alpha", "gamma"}
+        assert reloader.status()["documents"] == 3
+
+    asyncio.run(scenario())
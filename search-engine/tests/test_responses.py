@@ -0,0 +1,90 @@
+import asyncio
+import os
+
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from catalog import FileInfo
+from responses import PaperFileResponse
+
+
+def catalogued(path):
+    stat = os.stat(path)
+    return FileInfo(path, stat.st_size, stat.st_mtime_ns)
+
+
+def client_for(info):
+    # The info as the catalog saw it when it last scanned the folder
+    app = Starlette(routes=[Route("/file", lambda request: PaperFileResponse(info), methods=["GET", "HEAD"])])
+    return TestClient(app)
+
+
+def test_conditional_range_and_head_requests(tmp_path):
+    path = tmp_path / "paper.pdf"
+    path.write_bytes(b"0123456789")
+    info = catalogued(path)
+    client = client_for(info)
+
+    response = client.get("/file")
+    assert response.status_code == 200 and response.content == b"0123456789"
+    assert response.headers["etag"] == info.etag and response.headers["content-length"] == "10"
+
+    assert client.get("/file", headers={"if-none-match": f'W/{info.etag}'}).status_code == 304
+    assert client.get("/file", headers={"if-none-match": '"other"'}).status_code == 200
+
+    response = client.get("/file", headers={"range": "bytes=2-5"})
+    assert response.status_code == 206 and response.content == b"2345"
+    assert response.headers["content-range"] == "bytes 2-5/10"
+
+    response = client.get("/file", headers={"range": "bytes=-3"})
+    assert response.status_code == 206 and response.content == b"789"
+    assert response.headers["content-range"] == "bytes 7-9/10"
+
+    # A stale If-Range sends the whole file
+    assert client.get("/file", headers={"range": "bytes=2-5", "if-range": '"old"'}).content == b"0123456789"
+
+    response = client.get("/file", headers={"range": "bytes=10-"})
+    assert response.status_code == 416 and response.headers["content-range"] == "bytes */10"
+
+    response = client.head("/file")
+    assert response.status_code == 200 and response.content == b""
+    assert response.headers["content-length"] == "10"
+
+
+def test_files_changed_after_the_scan_send_current_headers(tmp_path):
+    path = tmp_path / "summary.md"
+    path.write_bytes(b"x" * 5000)
+    stale = catalogued(path)
+    client = client_for(stale)
+
+    path.write_bytes(b"rewritten in place")
+    os.utime(path, ns=(stale.mtime_ns + 10**9, stale.mtime_ns + 10**9))
+    assert client.get("/file", headers={"if-none-match": stale.etag}).status_code == 200
+    response = client.get("/file")
+    assert response.content == b"rewritten in place"
+    assert response.headers["content-length"] == str(len(b"rewritten in place"))
+    assert response.headers["etag"] == catalogued(path).etag != stale.etag
+
+    path.unlink()
+    assert client.get("/file").status_code == 404
+    assert client.get("/file", headers={"if-none-match": stale.etag}).status_code == 404
+
+
+def test_zero_copy_sends_the_opened_descriptor(tmp_path):
+    path = tmp_path / "paper.pdf"
+    path.write_bytes(b"0123456789")
+    messages = []
+
+    async def send(message):
+        if message["type"] == "http.response.zerocopy":
+            message = {**message, "body": os.pread(message["file"], message["count"], message["offset"])}
+        messages.append(message)
+
+    scope = {
+        "type": "http", "method": "GET", "headers": [(b"range", b"bytes=4-")],
+        "extensions": {"http.response.zerocopy": {}},
+    }
+    asyncio.run(PaperFileResponse(catalogued(path))(scope, None, send))
+    assert messages[0]["status"] == 206
+    assert (messages[1]["type"], messages[1]["offset"], messages[1]["body"]) == ("http.response.zerocopy", 4, b"456789")
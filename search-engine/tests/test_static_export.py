@@ -0,0 +1,63 @@
+import gzip
+import json
+from math import log
+
+from engine import SearchEngine, normalize_string
+from static_export import export_static, plan_shards, shard_key
+
+
+def read_json(path):
+    data = path.read_bytes()
+    return json.loads(gzip.decompress(data) if data[:2] == b"\x1f\x8b" else data)
+
+
+def static_search(out_dir, query):
+    """Python port of StaticSearch.search in static-search.js."""
+    meta = read_json(out_dir / "meta.json")
+    docs = read_json(out_dir / "docs.json.gz")
+    scores = {}
+    for term in normalize_string(query).split():
+        key = next(
+            (shard_key(term[:n]) for n in range(min(len(term), meta["max_prefix_length"]), 0, -1)
+             if shard_key(term[:n]) in meta["shards"]),
+            None,
+        )
+        if key is None or term not in (shard := read_json(out_dir / "shards" / f"{key}.json.gz")):
+            continue
+        gaps, frequencies = shard[term]
+        idf = log((meta["documents"] - len(gaps) + 0.5) / (len(gaps) + 0.5) + 1)
+        doc_id = 0
+        for gap, tf in zip(gaps, frequencies):
+            doc_id += gap
+            length = docs["lengths"][doc_id]
+            score = idf * tf * (meta["k1"] + 1) / (
+                tf + meta["k1"] * (1 - meta["b"] + meta["b"] * length / meta["avdl"])
+            )
+            name = docs["names"][doc_id]
+            scores[name] = scores.get(name, 0.0) + score
+    return scores
+
+
+def test_export_scores_match_engine(tmp_path):
+    engine = SearchEngine()
+    engine.bulk_index([
+        ("a", "Cookstove emissions and cooking smoke"),
+        ("b", "cookstove cookstove efficiency"),
+        ("c", "Café stoves: über-efficient cookers"),
+        ("d", "co2 from coal cooking"),
+    ])
+    summary = export_static(engine, tmp_path, prefix_length=1, max_shard_postings=2)
+
+    assert summary["terms"] == engine.stats()["vocabulary_size"]
+    assert (tmp_path / "index.html").exists() and (tmp_path / "static-search.js").exists()
+    for query in ("cookstove smoke", "café über", "co2 cooking cookers", "missing"):
+        expected = engine.search(query)
+        actual = static_search(tmp_path, query)
+        assert actual.keys() == expected.keys()
+        assert all(abs(actual[name] - expected[name]) < 1e-9 for name in expected)
+
+
+def test_oversized_shards_split_by_longer_prefix():
+    lengths = {"co": 1, "cook": 5, "coal": 5, "cat": 1}
+    assignment = plan_shards(lengths, prefix_length=1, max_postings=5, max_prefix_length=3)
+    assert assignment == {"cat": "ca", "co": "co", "cook": "coo", "coal": "coa"}